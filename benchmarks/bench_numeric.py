@@ -0,0 +1,68 @@
+"""Benchmark DatumNumericDetector against the regex path on integer values.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_numeric.py
+"""
+import random
+import timeit
+from typing import List
+
+from piicatcher.scanner import DatumNumericDetector, DatumRegexDetector
+
+BATCH_SIZE = 20
+
+
+def make_batches(size: int = 20000, seed: int = 0) -> List[List[int]]:
+    """Batches of ids, SSNs, phone numbers and card numbers"""
+    rnd = random.Random(seed)
+    values = []
+    for i in range(size):
+        choice = rnd.random()
+        if choice < 0.4:
+            values.append(i)
+        elif choice < 0.6:
+            values.append(rnd.randrange(100000000, 900000000))
+        elif choice < 0.8:
+            values.append(rnd.randrange(2000000000, 9999999999))
+        else:
+            values.append(rnd.randrange(10 ** 15, 10 ** 16))
+    return [values[i : i + BATCH_SIZE] for i in range(0, len(values), BATCH_SIZE)]
+
+
+def values_per_second(func, batches: List[List[int]], repeat: int = 5) -> float:
+    seconds = min(
+        timeit.repeat(
+            lambda: [func(batch) for batch in batches], number=1, repeat=repeat
+        )
+    )
+    return sum(len(batch) for batch in batches) / seconds
+
+
+def main():
+    batches = make_batches()
+    numeric = DatumNumericDetector()
+    regex = DatumRegexDetector()
+
+    def check_every_value(batch: List[int]):
+        # Worst case of the numeric path: all the values of a batch are checked
+        return [numeric.detect(column=None, datum=value) for value in batch]
+
+    def regex_every_value(batch: List[int]):
+        return [regex.detect(column=None, datum=str(value)) for value in batch]
+
+    print("values: {}".format(sum(len(batch) for batch in batches)))
+    print(
+        "regex on str():  {:,.0f} values/s".format(
+            values_per_second(regex_every_value, batches)
+        )
+    )
+    print(
+        "numeric checks:  {:,.0f} values/s".format(
+            values_per_second(check_every_value, batches)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark the overhead of progress reporting in the loop of data_scan.
+
+A bar that is updated for every value is compared with reporters of
+piicatcher.progress that are updated once per table.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_progress.py
+"""
+import io
+import timeit
+from contextlib import redirect_stderr
+from typing import List, Tuple
+
+from tqdm import tqdm
+
+from piicatcher.progress import (
+    JsonLogProgress,
+    NullProgress,
+    ProgressReporter,
+    TtyProgress,
+)
+
+TABLES = 200
+COLUMNS = 10
+ROWS = 100
+
+
+def make_values() -> List[Tuple[str, int]]:
+    """(table, value) in the order of data_generator"""
+    tables = ["table_{}".format(t) for t in range(TABLES)]
+    return [(table, v) for table in tables for v in range(COLUMNS * ROWS)]
+
+
+def bare(values: List[Tuple[str, int]]) -> int:
+    # data_scan checks for a new table anyway
+    counter = 0
+    current_table = None
+    for table, val in values:
+        if table is not current_table:
+            current_table = table
+        counter += 1
+    return counter
+
+
+def per_value_bar(values: List[Tuple[str, int]]) -> int:
+    counter = 0
+    current_table = None
+    for table, val in tqdm(values, total=len(values), desc="datum", unit="datum"):
+        if table is not current_table:
+            current_table = table
+        counter += 1
+    return counter
+
+
+def per_table(reporter: ProgressReporter, values: List[Tuple[str, int]]) -> int:
+    counter = 0
+    reported = 0
+    current_table = None
+    with reporter.start("datum", len(values), "values"):
+        for table, val in values:
+            if table is not current_table:
+                if current_table is not None:
+                    reporter.update(counter - reported, current_table)
+                    reported = counter
+                current_table = table
+            counter += 1
+        reporter.update(counter - reported, current_table)
+    return counter
+
+
+def seconds(func, values: List[Tuple[str, int]], repeat: int = 5) -> float:
+    with redirect_stderr(io.StringIO()):
+        return min(timeit.repeat(lambda: func(values), number=1, repeat=repeat))
+
+
+def main():
+    values = make_values()
+    base = seconds(bare, values)
+    runs = [
+        ("bar per value", per_value_bar),
+        ("none per table", lambda v: per_table(NullProgress(), v)),
+        ("tty per table", lambda v: per_table(TtyProgress(), v)),
+        ("json per table", lambda v: per_table(JsonLogProgress(), v)),
+    ]
+
+    print("values: {:,}, tables: {}".format(len(values), TABLES))
+    print("{:<16} {:>8.1f} ns/value".format("no progress", base / len(values) * 1e9))
+    for name, func in runs:
+        overhead = (seconds(func, values) - base) / len(values) * 1e9
+        print("{:<16} {:>8.1f} ns/value overhead".format(name, overhead))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark the loop of data_scan over ORM columns and over ColumnInfo work items.
+
+data_scan reads the id of the column of every value. An ORM CatColumn goes through
+an instrumented attribute for every read while ColumnInfo is a tuple.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_work_items.py
+"""
+import timeit
+from typing import Any, Dict, List, Tuple
+
+from dbcat.catalog import CatColumn, CatSchema, CatSource, CatTable
+
+from piicatcher.detectors import ColumnInfo
+
+TABLES = 200
+COLUMNS = 10
+ROWS = 100
+
+
+def make_columns() -> List[List[CatColumn]]:
+    schema = CatSchema(name="public", source=CatSource(name="db", source_type="sqlite"))
+    tables = []
+    for t in range(TABLES):
+        table = CatTable(name="table_{}".format(t), schema=schema)
+        tables.append(
+            [
+                CatColumn(
+                    id=t * COLUMNS + c,
+                    name="column_{}".format(c),
+                    data_type="varchar",
+                    sort_order=c,
+                    table=table,
+                )
+                for c in range(COLUMNS)
+            ]
+        )
+    return tables
+
+
+def make_values(tables: List[List[Any]]) -> List[Tuple[Any, int]]:
+    """(column, value) in the order of data_generator"""
+    return [
+        (column, r) for columns in tables for r in range(ROWS) for column in columns
+    ]
+
+
+def scan(values: List[Tuple[Any, int]]) -> int:
+    batches: Dict[int, Tuple[Any, List[Any]]] = {}
+    for column, val in values:
+        batch = batches.get(column.id)
+        if batch is None:
+            batch = batches[column.id] = (column, [])
+        batch[1].append(val)
+    return len(batches)
+
+
+def seconds(values: List[Tuple[Any, int]], repeat: int = 5) -> float:
+    return min(timeit.repeat(lambda: scan(values), number=1, repeat=repeat))
+
+
+def main():
+    tables = make_columns()
+    orm_values = make_values(tables)
+    info_values = make_values(
+        [[ColumnInfo.from_column(column) for column in columns] for columns in tables]
+    )
+
+    print("values: {:,}, columns: {:,}".format(len(orm_values), TABLES * COLUMNS))
+    for name, values in [("CatColumn", orm_values), ("ColumnInfo", info_values)]:
+        nanos = seconds(values) / len(values) * 1e9
+        print("{:<12} {:>8.1f} ns/value".format(name, nanos))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 import datetime
 import logging
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Union
 
-from dbcat.api import scan_sources
 from dbcat.catalog import Catalog, CatSource
 from goog_stats import Stats
 
 from piicatcher import detectors
+from piicatcher.crawler import crawl_source, schema_fingerprints
 from piicatcher.detectors import DatumDetector, MetadataDetector, detector_registry
-from piicatcher.generators import SMALL_TABLE_MAX, column_generator, data_generator
+from piicatcher.generators import (
+    SMALL_TABLE_MAX,
+    column_generator,
+    count_columns,
+    count_sampled_columns,
+    data_generator,
+)
+from piicatcher.label_buffer import LabelBuffer
+from piicatcher.mirror import CatalogMirror
 from piicatcher.output import output_dict, output_tabular
-from piicatcher.scanner import data_scan, metadata_scan
+from piicatcher.progress import load_reporter
+from piicatcher.regex_engine import set_backend
+from piicatcher.runner import (
+    DEFAULT_CALL_BUDGET,
+    DEFAULT_COLUMN_BUDGET,
+    IsolatedDetector,
+)
+from piicatcher.scanner import (
+    data_scan,
+    metadata_scan,
+    metadata_scan_batches,
+    metadata_scan_schemas,
+)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -26,6 +46,20 @@ class OutputFormat(str, Enum):
     json = "json"
 
 
+class RegexBackendEnum(str, Enum):
+    auto = "auto"
+    re = "re"
+    re2 = "re2"
+    hyperscan = "hyperscan"
+
+
+class ProgressEnum(str, Enum):
+    auto = "auto"
+    tty = "tty"
+    json = "json"
+    none = "none"
+
+
 def scan_database(
     catalog: Catalog,
     source: CatSource,
@@ -38,11 +72,25 @@ def scan_database(
     include_table_regex: List[str] = None,
     exclude_table_regex: List[str] = None,
     sample_size: int = SMALL_TABLE_MAX,
+    regex_backend: RegexBackendEnum = RegexBackendEnum.auto,
+    workers: int = 1,
+    detector_timeout: float = DEFAULT_CALL_BUDGET,
+    column_timeout: float = DEFAULT_COLUMN_BUDGET,
+    untrusted_detectors: List[str] = None,
+    progress: ProgressEnum = ProgressEnum.auto,
+    chunked_session: bool = False,
+    crawl_workers: int = 1,
+    catalog_mirror: bool = False,
 ) -> Union[List[Any], Dict[Any, Any]]:
-    message = "Source: {source_name}, scan_type: {scan_type}, include_schema: {include_schema}, \
+    if chunked_session and catalog_mirror:
+        raise ValueError("chunked_session and catalog_mirror cannot be used together")
+    backend = set_backend(RegexBackendEnum(regex_backend).value)
+    reporter = load_reporter(ProgressEnum(progress).value)
+    message = "Source: {source_name}, scan_type: {scan_type}, regex_backend: {regex_backend}, include_schema: {include_schema}, \
             exclude_schema: {exclude_schema}, include_table: {include_table}, exclude_schema: {exclude_table}".format(
         source_name=source.name,
         scan_type=str(scan_type),
+        regex_backend=backend.name,
         include_schema=",".join(include_schema_regex)
         if include_schema_regex is not None
         else "None",
@@ -59,18 +107,10 @@ def scan_database(
 
     status_message = "Success"
     exit_code = 0
+    LOGGER.info(message)
 
     with catalog.managed_session:
         Stats().record_event("/pip/piicatcher", "scanning source")
-        scan_sources(
-            catalog=catalog,
-            source_names=[source.name],
-            include_schema_regex=include_schema_regex,
-            exclude_schema_regex=exclude_schema_regex,
-            include_table_regex=include_table_regex,
-            exclude_table_regex=exclude_table_regex,
-        )
-
         last_run: Optional[datetime.datetime] = None
         if incremental:
             last_task = catalog.get_latest_task("piicatcher.{}".format(source.name))
@@ -81,57 +121,88 @@ def scan_database(
                 LOGGER.debug("No last run found")
 
         try:
-            scan_sources(
+            crawled = crawl_source(
                 catalog=catalog,
-                source_names=[source.name],
+                source=source,
                 include_schema_regex=include_schema_regex,
                 exclude_schema_regex=exclude_schema_regex,
                 include_table_regex=include_table_regex,
                 exclude_table_regex=exclude_table_regex,
+                fingerprints=schema_fingerprints,
+                workers=crawl_workers,
             )
 
             Stats().record_event("/pip/piicatcher", "scan_type: {}".format(scan_type))
+            mirror: Optional[CatalogMirror] = None
+            labels: Optional[LabelBuffer] = None
+            if catalog_mirror:
+                mirror = CatalogMirror.load(
+                    catalog=catalog,
+                    source=source,
+                    last_run=last_run,
+                    exclude_schema_regex_str=exclude_schema_regex,
+                    include_schema_regex_str=include_schema_regex,
+                    exclude_table_regex_str=exclude_table_regex,
+                    include_table_regex_str=include_table_regex,
+                )
+                labels = mirror.labels
+                counts = mirror.count_columns()
+            else:
+                counts = count_columns(
+                    catalog=catalog,
+                    source=source,
+                    last_run=last_run,
+                    exclude_schema_regex_str=exclude_schema_regex,
+                    include_schema_regex_str=include_schema_regex,
+                    exclude_table_regex_str=exclude_table_regex,
+                    include_table_regex_str=include_table_regex,
+                )
             detector_list = [
                 detector()
                 for detector in detectors.detector_registry.get_all().values()
                 if issubclass(detector, MetadataDetector)
             ]
 
-            metadata_scan(
-                catalog=catalog,
-                detectors=detector_list,
-                work_generator=column_generator(
+            if mirror is not None:
+                metadata_scan(
                     catalog=catalog,
+                    detectors=detector_list,
+                    generator=mirror.columns(),
+                    total_columns=sum(counts.values()),
+                    progress=reporter,
+                    labels=labels,
+                )
+            elif chunked_session:
+                metadata_scan_batches(
+                    catalog=catalog,
+                    detectors=detector_list,
                     source=source,
                     last_run=last_run,
                     exclude_schema_regex_str=exclude_schema_regex,
                     include_schema_regex_str=include_schema_regex,
                     exclude_table_regex_str=exclude_table_regex,
                     include_table_regex_str=include_table_regex,
-                ),
-                generator=column_generator(
+                    total_columns=sum(counts.values()),
+                    progress=reporter,
+                )
+            elif workers > 1:
+                metadata_scan_schemas(
                     catalog=catalog,
+                    detectors=detector_list,
                     source=source,
                     last_run=last_run,
                     exclude_schema_regex_str=exclude_schema_regex,
                     include_schema_regex_str=include_schema_regex,
                     exclude_table_regex_str=exclude_table_regex,
                     include_table_regex_str=include_table_regex,
-                ),
-            )
-            if scan_type != ScanTypeEnum.metadata:
-                detector_list = [
-                    detector()
-                    for detector in detectors.detector_registry.get_all().values()
-                    if issubclass(detector, DatumDetector)
-                ]
-                Stats().record_event(
-                    "/pip/piicatcher", "scan_type: {}".format(scan_type)
+                    workers=workers,
+                    progress=reporter,
                 )
-                data_scan(
+            else:
+                metadata_scan(
                     catalog=catalog,
                     detectors=detector_list,
-                    work_generator=column_generator(
+                    generator=column_generator(
                         catalog=catalog,
                         source=source,
                         last_run=last_run,
@@ -140,7 +211,29 @@ def scan_database(
                         exclude_table_regex_str=exclude_table_regex,
                         include_table_regex_str=include_table_regex,
                     ),
-                    generator=data_generator(
+                    total_columns=sum(counts.values()),
+                    progress=reporter,
+                )
+            if scan_type != ScanTypeEnum.metadata:
+                untrusted = set(untrusted_detectors or [])
+                detector_list = [
+                    IsolatedDetector(name) if name in untrusted else detector()
+                    for name, detector in detectors.detector_registry.get_all().items()
+                    if issubclass(detector, DatumDetector)
+                ]
+                Stats().record_event(
+                    "/pip/piicatcher", "scan_type: {}".format(scan_type)
+                )
+                decided_columns: Set[int] = set()
+                include_numeric = any(d.numeric for d in detector_list)
+                if mirror is not None:
+                    generator = mirror.data_generator(
+                        sample_size=sample_size,
+                        decided_columns=decided_columns,
+                        include_numeric=include_numeric,
+                    )
+                else:
+                    generator = data_generator(
                         catalog=catalog,
                         source=source,
                         last_run=last_run,
@@ -149,18 +242,48 @@ def scan_database(
                         exclude_table_regex_str=exclude_table_regex,
                         include_table_regex_str=include_table_regex,
                         sample_size=sample_size,
-                    ),
-                    sample_size=sample_size,
-                )
+                        decided_columns=decided_columns,
+                        include_numeric=include_numeric,
+                    )
+                try:
+                    data_scan(
+                        catalog=catalog,
+                        detectors=detector_list,
+                        generator=generator,
+                        sample_size=sample_size,
+                        decided_columns=decided_columns,
+                        workers=workers,
+                        call_budget=detector_timeout if detector_timeout > 0 else None,
+                        column_budget=column_timeout if column_timeout > 0 else None,
+                        total_columns=count_sampled_columns(counts, include_numeric),
+                        progress=reporter,
+                        labels=labels,
+                    )
+                finally:
+                    for detector in detector_list:
+                        if isinstance(detector, IsolatedDetector):
+                            detector.close()
 
+            if mirror is not None:
+                mirror.flush()
             if output_format == OutputFormat.tabular:
-                return output_tabular(
-                    catalog=catalog, source=source, list_all=list_all, last_run=last_run
+                op: Union[List[Any], Dict[Any, Any]] = output_tabular(
+                    catalog=catalog,
+                    source=source,
+                    list_all=list_all,
+                    last_run=last_run,
+                    generator=mirror.output_columns() if mirror is not None else None,
                 )
             else:
-                return output_dict(
-                    catalog=catalog, source=source, list_all=list_all, last_run=last_run
+                op = output_dict(
+                    catalog=catalog,
+                    source=source,
+                    list_all=list_all,
+                    last_run=last_run,
+                    generator=mirror.output_columns() if mirror is not None else None,
                 )
+            schema_fingerprints.update(catalog, source.name, crawled)
+            return op
         except Exception as e:
             status_message = str(e)
             exit_code = 1
@@ -0,0 +1,90 @@
+"""Find keywords in text with an Aho-Corasick automaton"""
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Patterns of the form ^.*prefix(alt1|alt2|...).*$ with an ASCII prefix and
+# alternatives. They match a line that contains prefix + one of the alternatives.
+_keyword_pattern = re.compile(
+    r"^\^\.\*(?P<prefix>[A-Za-z0-9_-]*)(?:\((?P<alts>[A-Za-z0-9_|-]*)\))?\.\*\$$"
+)
+
+
+def literal_keywords(regex: "re.Pattern") -> Optional[List[str]]:
+    """Return the keywords of a case insensitive pattern like ^.*(a|b).*$ in lower
+    case or None if the pattern has any other form."""
+    if not regex.flags & re.IGNORECASE:
+        return None
+    match = _keyword_pattern.match(regex.pattern)
+    if match is None:
+        return None
+    prefix = match.group("prefix")
+    alts = match.group("alts")
+    keywords = (
+        [prefix + alt for alt in alts.split("|")] if alts is not None else [prefix]
+    )
+    if any(keyword == "" for keyword in keywords):
+        # An empty keyword matches every line
+        return None
+    return [keyword.lower() for keyword in keywords]
+
+
+class KeywordAutomaton:
+    """A deterministic Aho-Corasick automaton over (rank, keyword) pairs.
+
+    ``search`` scans the text once and returns the lowest rank of the keywords that
+    occur in it. Characters that are not in any keyword go back to the root.
+    """
+
+    def __init__(self, keywords: List[Tuple[int, str]]):
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Optional[int]] = [None]
+        for rank, keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    goto.append({})
+                    output.append(None)
+                    next_state = len(goto) - 1
+                    goto[state][char] = next_state
+                state = next_state
+            if output[state] is None or rank < output[state]:  # type: ignore
+                output[state] = rank
+
+        # Compute failure links breadth first and fill in the transitions of every
+        # state so that search does not follow failure links.
+        self._delta: List[Dict[str, int]] = [dict(goto[0])]
+        self._delta.extend({} for _ in range(len(goto) - 1))
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while len(queue) > 0:
+            state = queue.popleft()
+            failed = fail[state]
+            if output[failed] is not None and (
+                output[state] is None or output[failed] < output[state]  # type: ignore
+            ):
+                output[state] = output[failed]
+            delta = dict(self._delta[failed])
+            for char, next_state in goto[state].items():
+                fail[next_state] = self._delta[failed].get(char, 0)
+                delta[char] = next_state
+                queue.append(next_state)
+            self._delta[state] = delta
+
+        self._output = output
+        self._top = min((rank for rank, _ in keywords), default=None)
+
+    def search(self, text: str) -> Optional[int]:
+        delta = self._delta
+        output = self._output
+        state = 0
+        best: Optional[int] = None
+        for char in text:
+            state = delta[state].get(char, 0)
+            rank = output[state]
+            if rank is not None and (best is None or rank < best):
+                best = rank
+                if best == self._top:
+                    break
+        return best
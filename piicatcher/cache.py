@@ -0,0 +1,104 @@
+"""Caches of detector results"""
+import hashlib
+import logging
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dbcat.catalog.pii_types import PiiType
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Approximate size of a slot in an OrderedDict and its linked list node
+_ENTRY_OVERHEAD = 100
+
+
+def value_key(detector_name: str, value: Any) -> Tuple[str, bytes]:
+    """Key of a value in the cache. The value is stored as a 16 byte digest so that
+    every entry has the same size irrespective of the length of the value."""
+    digest = hashlib.blake2b(
+        "{}:{}".format(type(value).__name__, value).encode("utf-8", "surrogatepass"),
+        digest_size=16,
+    ).digest()
+    return detector_name, digest
+
+
+class DetectionCache:
+    """A LRU cache of the result of a detector for a value. It only stores results of
+    detectors that are ``context_free``. The cache evicts the least recently used
+    entries when it is larger than ``max_bytes``."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes], Optional[PiiType]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_bytes(key: Tuple[str, bytes]) -> int:
+        # Detector names are interned by the class and PiiTypes are shared, so only
+        # the key tuple and the digest are counted.
+        return sys.getsizeof(key) + sys.getsizeof(key[1]) + _ENTRY_OVERHEAD
+
+    def get(self, key: Tuple[str, bytes]) -> Tuple[bool, Optional[PiiType]]:
+        """Return (found, result). A result of None means that the value has no PII."""
+        if key not in self._entries:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return True, self._entries[key]
+
+    def put(self, key: Tuple[str, bytes], pii_type: Optional[PiiType]):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._entries[key] = pii_type
+            return
+
+        size = self._entry_bytes(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = pii_type
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            evicted, _ = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(evicted)
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        """Change the memory cap and evict entries to fit in it"""
+        self.max_bytes = max_bytes
+        while self._bytes > self.max_bytes and len(self._entries) > 0:
+            evicted, _ = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+# Shared by all scans in a process
+detection_cache = DetectionCache()
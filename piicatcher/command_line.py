@@ -23,12 +23,19 @@ from tabulate import tabulate
 from piicatcher import __version__, __google_analytics_tid__
 from piicatcher.api import (
     OutputFormat,
+    ProgressEnum,
+    RegexBackendEnum,
     ScanTypeEnum,
     list_detector_entry_points,
     list_detectors,
     scan_database,
 )
+from piicatcher.crawler import SCHEMA_FINGERPRINTS_FILE, schema_fingerprints
 from piicatcher.generators import SMALL_TABLE_MAX
+from piicatcher.hit_stats import HIT_STATS_FILE, hit_stats
+from piicatcher.name_cache import NAME_CACHE_FILE, name_cache
+from piicatcher.progress import progress_logger
+from piicatcher.runner import DEFAULT_CALL_BUDGET, DEFAULT_COLUMN_BUDGET
 from piicatcher.scanner import data_logger, scan_logger
 from goog_stats import Stats
 
@@ -201,6 +208,45 @@ def detect(
         sample_size: int = typer.Option(
             SMALL_TABLE_MAX, help="Sample size for large tables when running deep scan."
         ),
+        regex_backend: RegexBackendEnum = typer.Option(
+            RegexBackendEnum.auto,
+            case_sensitive=False,
+            help="Regular expression engine. auto uses re2 or hyperscan if installed.",
+        ),
+        workers: int = typer.Option(
+            1,
+            min=1,
+            help="No. of processes to run datum detectors in deep scan and threads to read columns of schemata.",
+        ),
+        detector_timeout: float = typer.Option(
+            DEFAULT_CALL_BUDGET,
+            help="Seconds a datum detector can take on a batch of values. 0 turns it off.",
+        ),
+        column_timeout: float = typer.Option(
+            DEFAULT_COLUMN_BUDGET,
+            help="Seconds a datum detector can take on a column. 0 turns it off.",
+        ),
+        untrusted_detector: Optional[List[str]] = typer.Option(
+            None, help="Run the datum detector in a separate process."
+        ),
+        progress: ProgressEnum = typer.Option(
+            ProgressEnum.auto,
+            case_sensitive=False,
+            help="Report progress with a bar(tty), JSON log lines(json) or not at all. auto chooses tty on a terminal.",
+        ),
+        chunked_session: bool = typer.Option(
+            False,
+            help="Read column names in batches and commit labels after every batch to bound memory in large catalogs.",
+        ),
+        crawl_workers: int = typer.Option(
+            1,
+            min=1,
+            help="No. of threads and catalog connections that add the schemata of the source to the catalog.",
+        ),
+        catalog_mirror: bool = typer.Option(
+            False,
+            help="Read the columns of the source from the catalog once and write all labels at the end of the scan.",
+        ),
 ):
     catalog = open_catalog(
         app_dir=dbcat.settings.APP_DIR,
@@ -219,19 +265,45 @@ def detect(
             try:
                 source = catalog.get_source(source_name)
                 analytics.record_event("/pip/piicatcher", "scan initiated for {}".format(source))
-                op = scan_database(
-                    catalog=catalog,
-                    source=source,
-                    scan_type=scan_type,
-                    incremental=incremental,
-                    output_format=dbcat.settings.OUTPUT_FORMAT,
-                    list_all=list_all,
-                    include_schema_regex=include_schema,
-                    exclude_schema_regex=exclude_schema,
-                    include_table_regex=include_table,
-                    exclude_table_regex=exclude_table,
-                    sample_size=sample_size,
+                hit_stats_path = Path(dbcat.settings.APP_DIR) / HIT_STATS_FILE
+                hit_stats.load(hit_stats_path)
+                name_cache_path = Path(dbcat.settings.APP_DIR) / NAME_CACHE_FILE
+                name_cache.load(name_cache_path)
+                fingerprints_path = (
+                    Path(dbcat.settings.APP_DIR) / SCHEMA_FINGERPRINTS_FILE
                 )
+                schema_fingerprints.load(fingerprints_path)
+                progress_handler = logging.StreamHandler()
+                progress_handler.setFormatter(jsonlogger.JsonFormatter())
+                progress_logger.addHandler(progress_handler)
+                try:
+                    op = scan_database(
+                        catalog=catalog,
+                        source=source,
+                        scan_type=scan_type,
+                        incremental=incremental,
+                        output_format=dbcat.settings.OUTPUT_FORMAT,
+                        list_all=list_all,
+                        include_schema_regex=include_schema,
+                        exclude_schema_regex=exclude_schema,
+                        include_table_regex=include_table,
+                        exclude_table_regex=exclude_table,
+                        sample_size=sample_size,
+                        regex_backend=regex_backend,
+                        workers=workers,
+                        detector_timeout=detector_timeout,
+                        column_timeout=column_timeout,
+                        untrusted_detectors=untrusted_detector,
+                        progress=progress,
+                        chunked_session=chunked_session,
+                        crawl_workers=crawl_workers,
+                        catalog_mirror=catalog_mirror,
+                    )
+                finally:
+                    progress_logger.removeHandler(progress_handler)
+                hit_stats.save(hit_stats_path)
+                name_cache.save(name_cache_path)
+                schema_fingerprints.save(fingerprints_path)
                 typer.echo(message=str_output(op, dbcat.settings.OUTPUT_FORMAT))
             except NoMatchesError:
                 typer.echo(message=NoMatchesError.message)
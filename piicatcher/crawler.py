@@ -0,0 +1,406 @@
+"""Crawl the schemata of a source into the catalog
+
+``dbcat.api.scan_sources`` looks up or adds every schema, table and column of a
+source in the catalog. ``crawl_source`` first reads a fingerprint of every schema
+with one aggregate query on the information schema of the source: the no. of tables
+and columns and a checksum of the name, type and position of every column. Only
+schemata with a fingerprint that changed since the last crawl into the catalog, or
+that are not in the catalog, are crawled. The fingerprints are kept per catalog and
+source across runs in ``schema_fingerprints.json`` in the app directory.
+
+With more than one worker, the information schema of the source is read once and
+every schema is merged into the catalog by a pool of threads. Each thread uses its
+own catalog session and adds the missing tables and columns of a schema with a few
+bulk statements instead of a lookup per column.
+"""
+import hashlib
+import json
+import logging
+import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from typing import Deque, Dict, Generator, List, Optional, Tuple
+
+from databuilder import Scoped
+from databuilder.models.table_metadata import TableMetadata
+from dbcat.api import scan_sources
+from dbcat.catalog import Catalog, CatSource
+from dbcat.catalog.db import DbScanner
+from dbcat.catalog.models import CatColumn, CatSchema, CatTable
+from dbcat.generators import NoMatchesError
+from sqlalchemy import create_engine, exc, text
+
+from piicatcher.json_state import JsonState
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA_FINGERPRINTS_FILE = "schema_fingerprints.json"
+
+# Rows of (schema, signal, ...). Schemata without columns are not returned. The
+# signals are the no. of tables and columns and a hash of the table, name, type and
+# position of every column, so that a new, renamed or altered column changes them.
+_fingerprint_queries = {
+    "postgresql": """
+        SELECT table_schema, count(DISTINCT table_name), count(*),
+            md5(string_agg(
+                table_name || '.' || column_name || ' ' || data_type || ' '
+                    || coalesce(character_maximum_length, numeric_precision, 0)
+                    || ' ' || ordinal_position,
+                ',' ORDER BY table_name, ordinal_position))
+        FROM information_schema.columns
+        WHERE table_schema NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+        GROUP BY table_schema
+    """,
+    # LISTAGG is limited to 64K. Sum 64 bits of the md5 of every column instead.
+    "redshift": """
+        SELECT table_schema, count(DISTINCT table_name), count(*),
+            sum(strtol(substring(column_hash, 1, 8), 16)),
+            sum(strtol(substring(column_hash, 9, 8), 16))
+        FROM (
+            SELECT table_schema, table_name, md5(
+                table_name || '.' || column_name || ' ' || data_type || ' '
+                    || coalesce(character_maximum_length, numeric_precision, 0)
+                    || ' ' || ordinal_position) AS column_hash
+            FROM information_schema.columns
+            WHERE table_schema NOT IN
+                ('information_schema', 'pg_catalog', 'pg_toast', 'pg_internal')
+        ) c
+        GROUP BY table_schema
+    """,
+    # GROUP_CONCAT is truncated at group_concat_max_len. Sum the md5 like Redshift.
+    "mysql": """
+        SELECT table_schema, count(DISTINCT table_name), count(*),
+            sum(cast(conv(substring(column_hash, 1, 8), 16, 10) AS UNSIGNED)),
+            sum(cast(conv(substring(column_hash, 9, 8), 16, 10) AS UNSIGNED))
+        FROM (
+            SELECT table_schema, table_name, md5(concat_ws(' ',
+                table_name, column_name, column_type, ordinal_position)) AS column_hash
+            FROM information_schema.columns
+            WHERE table_schema NOT IN
+                ('information_schema', 'performance_schema', 'sys', 'mysql')
+        ) c
+        GROUP BY table_schema
+    """,
+    "snowflake": """
+        SELECT table_schema, count(DISTINCT table_name), count(*),
+            hash_agg(table_name, column_name, data_type,
+                character_maximum_length, numeric_precision, ordinal_position)
+        FROM information_schema.columns
+        WHERE table_schema != 'INFORMATION_SCHEMA'
+        GROUP BY table_schema
+    """,
+    # SQLite sources have one schema without a name
+    "sqlite": """
+        SELECT '', count(DISTINCT name), count(*),
+            group_concat(name || '.' || column_name || ' ' || type || ' ' || cid, ',')
+        FROM (
+            SELECT m.name, p.name AS column_name, p.type, p.cid
+            FROM sqlite_master m JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+            ORDER BY m.name, p.cid
+        )
+    """,
+}
+
+
+def fingerprint_schemata(source: CatSource) -> Optional[Dict[str, List[str]]]:
+    """Returns schema name -> signals or None if they cannot be read from the
+    source"""
+    query = _fingerprint_queries.get(source.source_type)
+    if query is None:
+        return None
+    engine = create_engine(source.conn_string)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(query)).fetchall()
+    except exc.SQLAlchemyError as e:
+        LOGGER.warning("Cannot read schema fingerprints of %s: %s", source.name, e)
+        return None
+    finally:
+        engine.dispose()
+    return {row[0]: [str(signal) for signal in row[1:]] for row in rows}
+
+
+def _selected(
+    name: str, include_regex: Optional[List[str]], exclude_regex: Optional[List[str]]
+) -> bool:
+    """Same test of a schema name as dbcat.catalog.db.DbScanner"""
+    if include_regex is not None and len(include_regex) > 0:
+        passed = any(re.search(exp, name, re.IGNORECASE) for exp in include_regex)
+    else:
+        passed = True
+    if exclude_regex is not None and len(exclude_regex) > 0:
+        passed = passed and not any(
+            re.search(exp, name, re.IGNORECASE) for exp in exclude_regex
+        )
+    return passed
+
+
+class _SchemaReader(DbScanner):
+    """Reads the tables of a source with the extractor of dbcat without writing
+    them to the catalog"""
+
+    def schemata(self) -> Generator[Tuple[str, List[TableMetadata]], None, None]:
+        """Generate (schema name, tables) in the order of the extractor"""
+        with closing(self._extractor) as extractor:
+            extractor.init(Scoped.get_scoped_conf(self._conf, extractor.get_scope()))
+            name: Optional[str] = None
+            tables: List[TableMetadata] = []
+            for record in self._filter_rows(extractor):
+                if record.schema != name:
+                    if name is not None:
+                        yield name, tables
+                    name = record.schema
+                    tables = []
+                tables.append(record)
+            if name is not None:
+                yield name, tables
+
+
+def _merge_schema(
+    catalog: Catalog, source_id: int, name: str, tables: List[TableMetadata]
+) -> Tuple[int, int]:
+    """Add the schema and its tables and columns that are not in the catalog like
+    DbScanner.scan. Returns the no. of tables and columns that were added."""
+    session = catalog.get_scoped_session()
+    schema_id = (
+        session.query(CatSchema.id)
+        .filter(CatSchema.source_id == source_id, CatSchema.name == name)
+        .scalar()
+    )
+    if schema_id is None:
+        result = session.execute(
+            CatSchema.__table__.insert().values(name=name, source_id=source_id)
+        )
+        schema_id = result.inserted_primary_key[0]
+
+    def table_ids() -> Dict[str, int]:
+        return dict(
+            session.query(CatTable.name, CatTable.id).filter(
+                CatTable.schema_id == schema_id
+            )
+        )
+
+    existing_tables = table_ids()
+    new_tables = [
+        {"name": record.name, "schema_id": schema_id}
+        for record in {record.name: record for record in tables}.values()
+        if record.name not in existing_tables
+    ]
+    if len(new_tables) > 0:
+        session.execute(CatTable.__table__.insert(), new_tables)
+        existing_tables = table_ids()
+
+    existing_columns = set(
+        session.query(CatColumn.table_id, CatColumn.name)
+        .join(CatTable, CatColumn.table_id == CatTable.id)
+        .filter(CatTable.schema_id == schema_id)
+    )
+    new_columns = []
+    for record in tables:
+        table_id = existing_tables[record.name]
+        for index, column in enumerate(record.columns):
+            if (table_id, column.name) not in existing_columns:
+                existing_columns.add((table_id, column.name))
+                new_columns.append(
+                    {
+                        "name": column.name,
+                        "data_type": column.type,
+                        "sort_order": index,
+                        "table_id": table_id,
+                    }
+                )
+    if len(new_columns) > 0:
+        session.execute(CatColumn.__table__.insert(), new_columns)
+    return len(new_tables), len(new_columns)
+
+
+def _crawl(
+    catalog: Catalog,
+    source: CatSource,
+    include_schema_regex: List[str] = None,
+    exclude_schema_regex: List[str] = None,
+    include_table_regex: List[str] = None,
+    exclude_table_regex: List[str] = None,
+    workers: int = 1,
+):
+    """Crawl the source with scan_sources or, if workers is more than 1, merge the
+    schemata into the catalog in a pool of threads. Work in the current session is
+    committed first so that the threads see it. A SQLite catalog is written by one
+    connection at a time and is merged in this thread."""
+    if workers <= 1:
+        scan_sources(
+            catalog=catalog,
+            source_names=[source.name],
+            include_schema_regex=include_schema_regex,
+            exclude_schema_regex=exclude_schema_regex,
+            include_table_regex=include_table_regex,
+            exclude_table_regex=exclude_table_regex,
+        )
+        return
+
+    reader = _SchemaReader(
+        catalog,
+        source,
+        include_schema_regex_str=include_schema_regex,
+        exclude_schema_regex_str=exclude_schema_regex,
+        include_table_regex_str=include_table_regex,
+        exclude_table_regex_str=exclude_table_regex,
+    )
+    source_id = source.id
+    in_thread = catalog.engine.name == "sqlite"
+    if not in_thread:
+        catalog.get_scoped_session().commit()
+
+    def merge_in_thread(name: str, tables: List[TableMetadata]) -> Tuple[int, int]:
+        try:
+            added = _merge_schema(catalog, source_id, name, tables)
+            catalog.get_scoped_session().commit()
+            return added
+        finally:
+            # Sessions are thread local. Close the session of this thread.
+            catalog.get_scoped_session().remove()
+
+    added: List[Tuple[int, int]] = []
+    pending: Deque[Future] = deque()
+    # A schema that the extractor returns twice is merged after its first merge
+    merges: Dict[str, Future] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, tables in reader.schemata():
+            if in_thread:
+                added.append(_merge_schema(catalog, source_id, name, tables))
+                continue
+            if name in merges:
+                merges[name].result()
+            merges[name] = executor.submit(merge_in_thread, name, tables)
+            pending.append(merges[name])
+            while len(pending) > 2 * workers:
+                added.append(pending.popleft().result())
+        while len(pending) > 0:
+            added.append(pending.popleft().result())
+
+    if len(added) == 0:
+        raise NoMatchesError
+    LOGGER.info(
+        "Merged %d schemata of %s with %d workers. Added %d tables, %d columns",
+        len(added),
+        source.name,
+        workers,
+        sum(tables for tables, _ in added),
+        sum(columns for _, columns in added),
+    )
+
+
+def catalog_key(catalog: Catalog) -> str:
+    """The URL of the catalog. The password is masked."""
+    return repr(catalog.engine.url)
+
+
+class SchemaFingerprints(JsonState):
+    """Maps catalog -> source name -> schema name -> fingerprint of the last crawl.
+    A source is crawled into every catalog, so the fingerprints of a source in one
+    catalog are not the fingerprints of a source with the same name in another."""
+
+    description = "schema fingerprints"
+
+    def __init__(self):
+        self.fingerprints: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+    def get(self, catalog: Catalog, source_name: str) -> Dict[str, str]:
+        return self.fingerprints.get(catalog_key(catalog), {}).get(source_name, {})
+
+    def update(self, catalog: Catalog, source_name: str, fingerprints: Dict[str, str]):
+        self._update(catalog_key(catalog), source_name, fingerprints)
+
+    def _update(self, key: str, source_name: str, fingerprints: Dict[str, str]):
+        sources = self.fingerprints.setdefault(key, {})
+        sources.setdefault(source_name, {}).update(fingerprints)
+
+    def clear(self):
+        self.fingerprints = {}
+
+    def from_json(self, data: Dict[str, Dict[str, Dict[str, str]]]):
+        for key, sources in data.items():
+            for source_name, fingerprints in sources.items():
+                self._update(key, source_name, dict(fingerprints))
+
+    def to_json(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        return self.fingerprints
+
+
+def crawl_source(
+    catalog: Catalog,
+    source: CatSource,
+    include_schema_regex: List[str] = None,
+    exclude_schema_regex: List[str] = None,
+    include_table_regex: List[str] = None,
+    exclude_table_regex: List[str] = None,
+    fingerprints: Optional[SchemaFingerprints] = None,
+    workers: int = 1,
+) -> Dict[str, str]:
+    """Crawl the schemata of the source that changed since the fingerprints were
+    recorded. All the schemata are crawled if fingerprints is None or the source
+    does not support them. Returns the fingerprints of the crawled schemata. Record
+    them with SchemaFingerprints.update once the crawl is committed.
+
+    workers is the no. of threads, and catalog connections, that merge schemata
+    into the catalog. The source is read with one connection."""
+    signals = fingerprint_schemata(source) if fingerprints is not None else None
+    # A crawl with other table filters adds other tables
+    table_filters = [include_table_regex or [], exclude_table_regex or []]
+    current = {
+        name: hashlib.sha256(json.dumps([values, table_filters]).encode()).hexdigest()
+        for name, values in (signals or {}).items()
+        if _selected(name, include_schema_regex, exclude_schema_regex)
+    }
+    if fingerprints is None or len(current) == 0:
+        # The source is crawled like before and fails if no table matches
+        _crawl(
+            catalog,
+            source,
+            include_schema_regex,
+            exclude_schema_regex,
+            include_table_regex,
+            exclude_table_regex,
+            workers,
+        )
+        return {}
+
+    previous = fingerprints.get(catalog, source.name)
+    in_catalog = set(
+        name
+        for (name,) in catalog.get_scoped_session()
+        .query(CatSchema.name)
+        .filter(CatSchema.source_id == source.id)
+    )
+    changed = sorted(
+        name
+        for name, fingerprint in current.items()
+        if name not in in_catalog or previous.get(name) != fingerprint
+    )
+    LOGGER.info(
+        "%d of %d schemata of %s changed", len(changed), len(current), source.name
+    )
+    if len(changed) == 0:
+        return {}
+
+    try:
+        _crawl(
+            catalog,
+            source,
+            include_schema_regex=["^{}$".format(re.escape(name)) for name in changed],
+            include_table_regex=include_table_regex,
+            exclude_table_regex=exclude_table_regex,
+            workers=workers,
+        )
+    except NoMatchesError:
+        # Tables of the unchanged schemata matched in earlier crawls
+        if len(changed) == len(current):
+            raise
+        LOGGER.debug("No tables match the filters in %s", changed)
+    return {name: current[name] for name in changed}
+
+
+# Shared by all scans in a process
+schema_fingerprints = SchemaFingerprints()
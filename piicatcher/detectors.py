@@ -1,31 +1,108 @@
 import inspect
 from abc import ABC, abstractmethod
-from typing import Optional, Type
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type, overload
 
 import catalogue
 from dbcat.catalog.models import CatColumn
 from dbcat.catalog.pii_types import PiiType
 
 
+class ColumnInfo(NamedTuple):
+    """Attributes of a CatColumn that are sent to other processes. Detectors get
+    this instead of a CatColumn when they run in a worker or a subprocess."""
+
+    id: int
+    name: str
+    data_type: str
+    sort_order: int
+    fqdn: Tuple[str, str, str, str]
+
+    @overload
+    @classmethod
+    def from_column(cls, column: None) -> None:
+        ...
+
+    @overload
+    @classmethod
+    def from_column(cls, column: Any) -> "ColumnInfo":
+        ...
+
+    @classmethod
+    def from_column(cls, column: Any) -> Optional["ColumnInfo"]:
+        if column is None or isinstance(column, ColumnInfo):
+            return column
+        return cls(
+            id=column.id,
+            name=column.name,
+            data_type=column.data_type,
+            sort_order=column.sort_order,
+            fqdn=column.fqdn,
+        )
+
+
+class DatumMatch(NamedTuple):
+    """PII type that DatumDetector.detect_batch found and the value that has it"""
+
+    pii_type: PiiType
+    value: Any
+
+
 class Detector(ABC):
     """Scanner abstract class that defines required methods"""
 
     name: str
 
-    pass
+    def stats(self) -> Dict[str, int]:
+        """Counters of work done by the detector. They are logged at the end of a
+        scan."""
+        return {}
 
 
 class MetadataDetector(Detector):
+    # Change the version when the detector returns different results. Results of
+    # other versions in the name cache are dropped.
+    version: str = "1"
+
+    def name_key(self, column: CatColumn) -> Optional[str]:
+        """Return a key if the result only depends on the key, for e.g. the column
+        name. Results are then cached by key across runs. Return None to scan the
+        column every time."""
+        return None
+
     @abstractmethod
     def detect(self, column: CatColumn) -> Optional[PiiType]:
         """Scan the text and return an array of PiiTypes that are found"""
 
+    def detect_many(self, columns: List[CatColumn]) -> List[Optional[PiiType]]:
+        """Scan many columns and return the PiiType of each column or None in the
+        same order. Override to classify all the columns in one call."""
+        return [self.detect(column) for column in columns]
+
 
 class DatumDetector(Detector):
+    # Set to True if the result only depends on the value and not on the column. The
+    # results of these detectors are cached for every value.
+    context_free: bool = False
+    # Set to True if the detector scans numeric columns instead of text columns.
+    numeric: bool = False
+
     @abstractmethod
     def detect(self, column: CatColumn, datum: str) -> Optional[PiiType]:
         """Scan the text and return an array of PiiTypes that are found"""
 
+    def detect_batch(
+        self, column: CatColumn, values: List[Any]
+    ) -> Optional[DatumMatch]:
+        """Scan a batch of values of a column and return the PiiType of the first value
+        that has PII with the value. Override to process all the values in one
+        call."""
+        for datum in values:
+            pii_type = self.detect(column=column, datum=datum)
+            if pii_type is not None:
+                return DatumMatch(pii_type, datum)
+
+        return None
+
 
 detector_registry = catalogue.create("piicatcher", "detectors", entry_points=True)
 
@@ -1,19 +1,214 @@
 import datetime
 import logging
 import re
-from typing import Generator, List, Optional, Tuple
+from contextlib import closing
+from functools import lru_cache
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple
 
 from dbcat.catalog import Catalog, CatColumn, CatSchema, CatSource, CatTable
-from dbcat.generators import NoMatchesError, table_generator
-from sqlalchemy import create_engine, exc
+from dbcat.generators import CatalogObject, NoMatchesError, filter_objects
+from sqlalchemy import and_, create_engine, exc, func, not_, or_, true
+from sqlalchemy.orm import contains_eager
 
 from piicatcher.dbinfo import DbInfo, get_dbinfo
+from piicatcher.detectors import ColumnInfo
 
 LOGGER = logging.getLogger(__name__)
 
 SMALL_TABLE_MAX = 100
 
 
+# Columns fetched from the catalog in one round trip
+COLUMN_BATCH_SIZE = 1000
+
+# Constructs of Python regular expressions that PostgreSQL reads the same way.
+# Patterns with other constructs, for e.g. \b which is a backspace in PostgreSQL,
+# [[:alpha:]] or \N{...}, are filtered in Python. SQLite catalogs call re.
+_portable_token = re.compile(
+    r"""
+    (?P<quantifier>(?:[*+?]|\{\d+(?:,\d*)?\})\??)
+    | \\[dDsSwW]
+    | \\[^0-9A-Za-z]
+    | \[\^?\]?(?:[^\[\]\\]|\\[^0-9A-Za-z])*\]
+    | \((?!\?)
+    | [)|^$.]
+    | [^\\\[\](){}|^$.*+?]
+    """,
+    re.VERBOSE,
+)
+
+# Largest count of a bound in PostgreSQL
+_MAX_REPEAT = 255
+
+
+@lru_cache(maxsize=256)
+def _compile_filter(pattern: str):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _is_portable(pattern: str) -> bool:
+    """True if the pattern only has constructs in _portable_token. A quantifier
+    after a quantifier, for e.g. a possessive a*+, is not portable."""
+    position = 0
+    after_quantifier = False
+    while position < len(pattern):
+        token = _portable_token.match(pattern, position)
+        if token is None:
+            return False
+        quantifier = token.group("quantifier")
+        if quantifier is not None:
+            if after_quantifier:
+                return False
+            if any(int(n) > _MAX_REPEAT for n in re.findall(r"\d+", quantifier)):
+                return False
+        after_quantifier = quantifier is not None
+        position = token.end()
+    return True
+
+
+def _sqlite_regexp(pattern: str, value: Optional[str]) -> bool:
+    return value is not None and _compile_filter(pattern).search(value) is not None
+
+
+def _name_filter(
+    catalog: Catalog,
+    column: Any,
+    include_regex_str: Optional[List[str]],
+    exclude_regex_str: Optional[List[str]],
+) -> Optional[Any]:
+    """A SQL clause on the name column that matches the same objects as
+    filter_objects. Returns None if the catalog cannot evaluate the patterns. The
+    caller then filters in Python."""
+    include = include_regex_str or []
+    exclude = exclude_regex_str or []
+    if len(include) == 0 and len(exclude) == 0:
+        return true()
+
+    for pattern in include + exclude:
+        _compile_filter(pattern)
+    dialect = catalog.engine.dialect.name
+    if dialect == "postgresql":
+        operator = "~*"
+        for pattern in include + exclude:
+            if not _is_portable(pattern):
+                LOGGER.debug("Filtering %s in Python", pattern)
+                return None
+    elif dialect == "sqlite":
+        operator = "REGEXP"
+        # Register the function on the connection of this session
+        catalog.get_scoped_session().connection().connection.create_function(
+            "regexp", 2, _sqlite_regexp
+        )
+    else:
+        return None
+
+    clauses = [column.op(operator)(pattern) for pattern in include]
+    return and_(
+        or_(*clauses) if len(clauses) > 0 else true(),
+        *[not_(column.op(operator)(pattern)) for pattern in exclude],
+    )
+
+
+def _table_filter(
+    catalog: Catalog,
+    schema_ids: List[int],
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+) -> Tuple[Any, Optional[Set[int]]]:
+    """A SQL clause for the table patterns or, if the catalog cannot evaluate them,
+    the ids of the tables that match in Python"""
+    clause = _name_filter(
+        catalog, CatTable.name, include_table_regex_str, exclude_table_regex_str
+    )
+    if clause is not None:
+        return clause, None
+    table_ids = {
+        table.id
+        for table in filter_objects(
+            include_table_regex_str,
+            exclude_table_regex_str,
+            [
+                CatalogObject(name, table_id)
+                for table_id, name in catalog.get_scoped_session()
+                .query(CatTable.id, CatTable.name)
+                .filter(CatTable.schema_id.in_(schema_ids))
+                .all()
+            ],
+        )
+    }
+    return true(), table_ids
+
+
+def _bulk_columns(
+    catalog: Catalog,
+    schema_ids: List[int],
+    last_run: Optional[datetime.datetime] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+) -> Generator[CatColumn, None, None]:
+    """Columns of the schemata ordered by schema, table and sort order. The columns
+    are loaded with their table, schema and source in one query that is streamed in
+    batches instead of one query per table."""
+    if len(schema_ids) == 0:
+        return
+    clause, table_ids = _table_filter(
+        catalog, schema_ids, include_table_regex_str, exclude_table_regex_str
+    )
+    if table_ids is not None and len(table_ids) == 0:
+        return
+
+    query = (
+        catalog.get_scoped_session()
+        .query(CatColumn)
+        .join(CatColumn.table)
+        .join(CatTable.schema)
+        .join(CatSchema.source)
+        .options(
+            contains_eager(CatColumn.table)
+            .contains_eager(CatTable.schema)
+            .contains_eager(CatSchema.source)
+        )
+        .filter(CatSchema.id.in_(schema_ids))
+        .filter(clause)
+        .order_by(CatSchema.id, CatTable.id, CatColumn.sort_order)
+    )
+    if last_run is not None:
+        query = query.filter(CatColumn.updated_at > last_run)
+
+    for column in query.yield_per(COLUMN_BATCH_SIZE):
+        if table_ids is None or column.table_id in table_ids:
+            yield column
+
+
+def _table_generator(
+    catalog: Catalog,
+    schema_ids: List[int],
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+) -> Generator[Tuple[CatSchema, CatTable], None, None]:
+    """(schema, table) in the order of column_generator"""
+    if len(schema_ids) == 0:
+        return
+    clause, table_ids = _table_filter(
+        catalog, schema_ids, include_table_regex_str, exclude_table_regex_str
+    )
+    tables = (
+        catalog.get_scoped_session()
+        .query(CatTable)
+        .join(CatTable.schema)
+        .join(CatSchema.source)
+        .options(contains_eager(CatTable.schema).contains_eager(CatSchema.source))
+        .filter(CatSchema.id.in_(schema_ids))
+        .filter(clause)
+        .order_by(CatSchema.id, CatTable.id)
+        .all()
+    )
+    for table in tables:
+        if table_ids is None or table.id in table_ids:
+            LOGGER.debug("Generating table %s.%s", table.schema.name, table.name)
+            yield table.schema, table
+
+
 def column_generator(
     catalog: Catalog,
     source: CatSource,
@@ -23,24 +218,199 @@ def column_generator(
     include_table_regex_str: List[str] = None,
     exclude_table_regex_str: List[str] = None,
 ) -> Generator[Tuple[CatSchema, CatTable, CatColumn], None, None]:
+    """Generate (schema, table, column) ordered by schema, table and sort order"""
     try:
-        for schema, table in table_generator(
-            catalog=catalog,
-            source=source,
-            include_schema_regex_str=include_schema_regex_str,
-            exclude_schema_regex_str=exclude_schema_regex_str,
-            include_table_regex_str=include_table_regex_str,
-            exclude_table_regex_str=exclude_table_regex_str,
+        for column in _bulk_columns(
+            catalog,
+            schema_ids(
+                catalog, source, include_schema_regex_str, exclude_schema_regex_str
+            ),
+            last_run,
+            include_table_regex_str,
+            exclude_table_regex_str,
         ):
-            for column in catalog.get_columns_for_table(
-                table=table, newer_than=last_run
-            ):
-                LOGGER.debug(f"Scanning {schema.name}.{table.name}.{column.name}")
-                yield schema, table, column
+            table = column.table
+            LOGGER.debug(f"Scanning {table.schema.name}.{table.name}.{column.name}")
+            yield table.schema, table, column
     except StopIteration:
         raise NoMatchesError
 
 
+def schema_ids(
+    catalog: Catalog,
+    source: CatSource,
+    include_schema_regex_str: List[str] = None,
+    exclude_schema_regex_str: List[str] = None,
+) -> List[int]:
+    """Ids of the schemata that column_generator walks in the same order. The
+    patterns are evaluated by the catalog if it supports regular expressions."""
+    clause = _name_filter(
+        catalog, CatSchema.name, include_schema_regex_str, exclude_schema_regex_str
+    )
+    if clause is not None:
+        return [
+            schema_id
+            for schema_id, in catalog.get_scoped_session()
+            .query(CatSchema.id)
+            .join(CatSchema.source)
+            .filter(CatSource.name == source.name)
+            .filter(clause)
+            .order_by(CatSchema.id)
+        ]
+
+    schemata = filter_objects(
+        include_schema_regex_str,
+        exclude_schema_regex_str,
+        [
+            CatalogObject(s.name, s.id)
+            for s in catalog.search_schema(source_like=source.name, schema_like="%")
+        ],
+    )
+    return sorted(schema.id for schema in schemata)
+
+
+def schema_columns(
+    catalog: Catalog,
+    source_name: str,
+    schema_id: int,
+    last_run: Optional[datetime.datetime] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+) -> List[ColumnInfo]:
+    """Columns of a schema in the order of column_generator. Columns are returned as
+    ColumnInfo so that they can be used outside of the session that read them."""
+    return [
+        ColumnInfo.from_column(column)
+        for column in _bulk_columns(
+            catalog,
+            [schema_id],
+            last_run,
+            include_table_regex_str,
+            exclude_table_regex_str,
+        )
+    ]
+
+
+def count_columns(
+    catalog: Catalog,
+    source: CatSource,
+    last_run: Optional[datetime.datetime] = None,
+    include_schema_regex_str: List[str] = None,
+    exclude_schema_regex_str: List[str] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+) -> Dict[Optional[str], int]:
+    """No. of columns per data type that column_generator yields. The columns are
+    counted by one aggregate query instead of loading every column."""
+    ids = schema_ids(
+        catalog, source, include_schema_regex_str, exclude_schema_regex_str
+    )
+    if len(ids) == 0:
+        return {}
+    clause, table_ids = _table_filter(
+        catalog, ids, include_table_regex_str, exclude_table_regex_str
+    )
+    query = (
+        catalog.get_scoped_session()
+        .query(CatColumn.table_id, CatColumn.data_type, func.count())
+        .join(CatColumn.table)
+        .filter(CatTable.schema_id.in_(ids))
+        .filter(clause)
+        .group_by(CatColumn.table_id, CatColumn.data_type)
+    )
+    if last_run is not None:
+        query = query.filter(CatColumn.updated_at > last_run)
+
+    counts: Dict[Optional[str], int] = {}
+    for table_id, data_type, count in query:
+        if table_ids is None or table_id in table_ids:
+            counts[data_type] = counts.get(data_type, 0) + count
+    return counts
+
+
+# Tables in the IN clause of one query of column_batches
+MAX_BATCH_TABLES = 500
+
+
+def column_batches(
+    catalog: Catalog,
+    source: CatSource,
+    last_run: Optional[datetime.datetime] = None,
+    include_schema_regex_str: List[str] = None,
+    exclude_schema_regex_str: List[str] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+    batch_size: int = COLUMN_BATCH_SIZE,
+) -> Generator[List[ColumnInfo], None, None]:
+    """Columns of column_generator in the same order in lists of at most batch_size
+    columns. A table with more columns is a batch of its own. Every batch is read by
+    its own query as ColumnInfo rows. No ORM objects are loaded, so the session can
+    be committed between batches and its identity map does not grow."""
+    ids = schema_ids(
+        catalog, source, include_schema_regex_str, exclude_schema_regex_str
+    )
+    if len(ids) == 0:
+        return
+    clause, table_ids = _table_filter(
+        catalog, ids, include_table_regex_str, exclude_table_regex_str
+    )
+    session = catalog.get_scoped_session()
+    query = (
+        session.query(CatColumn.table_id, func.count())
+        .join(CatColumn.table)
+        .filter(CatTable.schema_id.in_(ids))
+        .filter(clause)
+        .group_by(CatTable.schema_id, CatColumn.table_id)
+        .order_by(CatTable.schema_id, CatColumn.table_id)
+    )
+    if last_run is not None:
+        query = query.filter(CatColumn.updated_at > last_run)
+    tables = [
+        (table_id, count)
+        for table_id, count in query
+        if table_ids is None or table_id in table_ids
+    ]
+
+    def load(batch_tables: List[int]) -> List[ColumnInfo]:
+        rows = (
+            session.query(
+                CatColumn.id,
+                CatColumn.name,
+                CatColumn.data_type,
+                CatColumn.sort_order,
+                CatSource.name,
+                CatSchema.name,
+                CatTable.name,
+            )
+            .select_from(CatColumn)
+            .join(CatColumn.table)
+            .join(CatTable.schema)
+            .join(CatSchema.source)
+            .filter(CatColumn.table_id.in_(batch_tables))
+            .order_by(CatSchema.id, CatTable.id, CatColumn.sort_order)
+        )
+        if last_run is not None:
+            rows = rows.filter(CatColumn.updated_at > last_run)
+        return [
+            ColumnInfo(column_id, name, data_type, sort_order, (*fqdn, name))
+            for column_id, name, data_type, sort_order, *fqdn in rows
+        ]
+
+    batch_tables: List[int] = []
+    size = 0
+    for table_id, count in tables:
+        if len(batch_tables) > 0 and (
+            size + count > batch_size or len(batch_tables) >= MAX_BATCH_TABLES
+        ):
+            yield load(batch_tables)
+            batch_tables = []
+            size = 0
+        batch_tables.append(table_id)
+        size += count
+    if len(batch_tables) > 0:
+        yield load(batch_tables)
+
+
 def _get_table_count(
     schema: CatSchema,
     table: CatTable,
@@ -60,7 +430,7 @@ def _get_table_count(
 def _get_query(
     schema: CatSchema,
     table: CatTable,
-    column_list: List[CatColumn],
+    column_list: List[ColumnInfo],
     dbinfo: DbInfo,
     connection,
     source: CatSource,
@@ -89,7 +459,7 @@ def _row_generator(
     source: CatSource,
     schema: CatSchema,
     table: CatTable,
-    column_list: List[CatColumn],
+    column_list: List[ColumnInfo],
     sample_size=SMALL_TABLE_MAX,
 ):
     if source.source_type == "bigquery":
@@ -118,27 +488,57 @@ def _row_generator(
             row = result.fetchone()
 
 
-def _filter_text_columns(column_list: List[CatColumn]) -> List[CatColumn]:
-    data_type_regex = [
-        re.compile(exp, re.IGNORECASE) for exp in [".*char.*", ".*text.*", ".*string.*"]
-    ]
+_text_type_regex = [
+    re.compile(exp, re.IGNORECASE) for exp in [".*char.*", ".*text.*", ".*string.*"]
+]
+
+
+def _is_text_type(data_type: Optional[str]) -> bool:
+    return data_type is not None and any(
+        regex.search(data_type) is not None for regex in _text_type_regex
+    )
 
-    matched_set = set()
-    for regex in data_type_regex:
-        matched_set |= set(
-            list(
-                filter(
-                    lambda m: m.data_type is not None
-                    and regex.search(m.data_type) is not None,
-                    column_list,
-                )
-            )
-        )
 
+def _filter_text_columns(column_list: List[CatColumn]) -> List[CatColumn]:
+    matched_set = set(
+        column for column in column_list if _is_text_type(column.data_type)
+    )
     LOGGER.debug(f"{len(matched_set)} text columns found")
     return list(matched_set)
 
 
+_numeric_type = re.compile(
+    r"^((tiny|small|medium|big)?int(eger|\d+)?(\s+unsigned)?|numeric|decimal|number)\b",
+    re.IGNORECASE,
+)
+
+
+def _is_numeric_type(data_type: Optional[str]) -> bool:
+    """Integer and fixed point types that can store SSNs, card and phone numbers"""
+    return data_type is not None and _numeric_type.search(data_type) is not None
+
+
+def _is_numeric_column(column: Any) -> bool:
+    return _is_numeric_type(column.data_type)
+
+
+def _filter_numeric_columns(column_list: List[CatColumn]) -> List[CatColumn]:
+    matched = [column for column in column_list if _is_numeric_column(column)]
+    LOGGER.debug(f"{len(matched)} numeric columns found")
+    return matched
+
+
+def count_sampled_columns(
+    counts: Dict[Optional[str], int], include_numeric: bool = False
+) -> int:
+    """No. of columns that data_generator samples from counts of count_columns"""
+    return sum(
+        count
+        for data_type, count in counts.items()
+        if _is_text_type(data_type) or (include_numeric and _is_numeric_type(data_type))
+    )
+
+
 def data_generator(
     catalog: Catalog,
     source: CatSource,
@@ -148,32 +548,94 @@ def data_generator(
     include_table_regex_str: List[str] = None,
     exclude_table_regex_str: List[str] = None,
     sample_size=SMALL_TABLE_MAX,
-) -> Generator[Tuple[CatSchema, CatTable, CatColumn, str], None, None]:
-    for schema, table in table_generator(
-        catalog=catalog,
+    decided_columns: Optional[Set[int]] = None,
+    include_numeric: bool = False,
+) -> Generator[Tuple[CatSchema, CatTable, ColumnInfo, Any], None, None]:
+    """Generate (schema, table, column, value) for every sampled cell.
+
+    Only text columns are sampled. Numeric columns are sampled as well if
+    ``include_numeric`` is set. Columns are yielded as ColumnInfo which is created
+    once per table. Scanners load the CatColumn only to write a label.
+
+    If ``decided_columns`` is given, it is shared with the consumer which adds the id
+    of every column it has labelled. Values of those columns are not yielded anymore
+    and the query for a table is cancelled once all of its columns are decided.
+    """
+    yield from sample_tables(
         source=source,
-        include_schema_regex_str=include_schema_regex_str,
-        exclude_schema_regex_str=exclude_schema_regex_str,
-        include_table_regex_str=include_table_regex_str,
-        exclude_table_regex_str=exclude_table_regex_str,
-    ):
+        tables=_table_generator(
+            catalog,
+            schema_ids(
+                catalog, source, include_schema_regex_str, exclude_schema_regex_str
+            ),
+            include_table_regex_str,
+            exclude_table_regex_str,
+        ),
+        get_columns=lambda table: catalog.get_columns_for_table(
+            table=table, newer_than=last_run
+        ),
+        sample_size=sample_size,
+        decided_columns=decided_columns,
+        include_numeric=include_numeric,
+    )
+
+
+def sample_tables(
+    source: CatSource,
+    tables: Iterable[Tuple[CatSchema, CatTable]],
+    get_columns: Callable[[CatTable], List[Any]],
+    sample_size=SMALL_TABLE_MAX,
+    decided_columns: Optional[Set[int]] = None,
+    include_numeric: bool = False,
+) -> Generator[Tuple[CatSchema, CatTable, ColumnInfo, Any], None, None]:
+    """Generate (schema, table, column, value) like data_generator for the tables.
+    get_columns returns the CatColumn or ColumnInfo of a table that are scanned."""
+    tables_cancelled = 0
+    values_skipped = 0
+    for schema, table in tables:
         try:
-            columns = catalog.get_columns_for_table(table=table, newer_than=last_run)
-            columns = _filter_text_columns(columns)
+            all_columns = get_columns(table)
+            sampled = _filter_text_columns(all_columns)
+            if include_numeric:
+                sampled += _filter_numeric_columns(all_columns)
+            columns = [ColumnInfo.from_column(column) for column in sampled]
 
             if len(columns) > 0:
-                for row in _row_generator(
-                    column_list=columns,
-                    schema=schema,
-                    table=table,
-                    source=source,
-                    sample_size=sample_size,
-                ):
-                    for col, val in zip(columns, row):
-                        yield schema, table, col, val
+                with closing(
+                    _row_generator(
+                        column_list=columns,
+                        schema=schema,
+                        table=table,
+                        source=source,
+                        sample_size=sample_size,
+                    )
+                ) as rows:
+                    for row in rows:
+                        for col, val in zip(columns, row):
+                            if (
+                                decided_columns is not None
+                                and col.id in decided_columns
+                            ):
+                                values_skipped += 1
+                                continue
+                            yield schema, table, col, val
+                        if decided_columns is not None and all(
+                            col.id in decided_columns for col in columns
+                        ):
+                            LOGGER.debug(
+                                "All columns of %s.%s are labelled. Cancel query",
+                                schema.name,
+                                table.name,
+                            )
+                            tables_cancelled += 1
+                            break
         except StopIteration:
             raise NoMatchesError
         except exc.SQLAlchemyError as e:
             LOGGER.warning(
                 f"Exception when getting data for {schema.name}.{table.name}. Code: {e.code}"
             )
+
+    LOGGER.info(
+        "Tables Cancelled: %d, Values Skipped: %d", tables_cancelled, values_skipped
+    )
@@ -0,0 +1,101 @@
+"""Hit rates of detectors and their patterns per column family
+
+The rates are used to try the patterns that are likely to match first. They never
+change the result of a scan. Detectors and patterns still have a fixed priority and
+the highest priority match is always chosen.
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from piicatcher.json_state import JsonState
+
+LOGGER = logging.getLogger(__name__)
+
+HIT_STATS_FILE = "hit_stats.json"
+
+# Rates are not used until a key has been tried these many times in a family
+MIN_TRIALS = 10
+# Families after this limit are not recorded
+MAX_FAMILIES = 10000
+
+_non_alpha = re.compile(r"[^a-z]+")
+
+
+def column_family(column: Any) -> Optional[str]:
+    """Group columns by name without digits and punctuation. For e.g. EMAIL_1 and
+    email are in the same family."""
+    if column is None or getattr(column, "name", None) is None:
+        return None
+    family = _non_alpha.sub("_", column.name.lower()).strip("_")
+    return family if family else None
+
+
+class HitStats(JsonState):
+    """Counts of (trials, hits) per column family and key. A key is a detector name
+    or <detector name>/<pattern name>."""
+
+    description = "hit stats"
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, List[int]]] = {}
+        self._delta: Dict[str, Dict[str, List[int]]] = {}
+
+    def record(self, family: Optional[str], key: str, hit: bool):
+        if family is None:
+            return
+        for counts in (self.counts, self._delta):
+            if family not in counts and len(counts) >= MAX_FAMILIES:
+                continue
+            trials_hits = counts.setdefault(family, {}).setdefault(key, [0, 0])
+            trials_hits[0] += 1
+            if hit:
+                trials_hits[1] += 1
+
+    def rate(self, family: Optional[str], key: str) -> Optional[float]:
+        """Return the hit rate or None if there are not enough trials"""
+        if family is None:
+            return None
+        trials, hits = self.counts.get(family, {}).get(key, (0, 0))
+        if trials < MIN_TRIALS:
+            return None
+        return hits / trials
+
+    def likely(
+        self, family: Optional[str], keys: List[str], min_rate: float = 0.5
+    ) -> List[str]:
+        """Return keys with a hit rate of at least min_rate, most likely first"""
+        rates: List[Tuple[float, int, str]] = []
+        for index, key in enumerate(keys):
+            rate = self.rate(family, key)
+            if rate is not None and rate >= min_rate:
+                rates.append((-rate, index, key))
+        return [key for _, _, key in sorted(rates)]
+
+    def take_delta(self) -> Dict[str, Dict[str, List[int]]]:
+        """Return the counts recorded since the last call"""
+        delta, self._delta = self._delta, {}
+        return delta
+
+    def merge(self, counts: Dict[str, Dict[str, List[int]]]):
+        for family, keys in counts.items():
+            if family not in self.counts and len(self.counts) >= MAX_FAMILIES:
+                continue
+            for key, (trials, hits) in keys.items():
+                trials_hits = self.counts.setdefault(family, {}).setdefault(key, [0, 0])
+                trials_hits[0] += trials
+                trials_hits[1] += hits
+
+    def clear(self):
+        self.counts = {}
+        self._delta = {}
+
+    def from_json(self, data: Dict[str, Dict[str, List[int]]]):
+        self.merge(data)
+
+    def to_json(self) -> Dict[str, Dict[str, List[int]]]:
+        return self.counts
+
+
+# Shared by all scans in a process
+hit_stats = HitStats()
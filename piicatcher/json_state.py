@@ -0,0 +1,53 @@
+"""State of scans that is kept across runs in JSON files in the app directory
+
+Hit stats, the column name cache and the schema fingerprints are loaded before a
+scan and saved after it. A file that is missing or cannot be read is ignored and
+the state starts empty. Files are written to a temporary file first and replace
+the old file, so a scan that is killed does not leave a partial file.
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JsonState(ABC):
+    """Load and save the state of a subclass. ``description`` names the state in
+    warnings."""
+
+    description = "state"
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def from_json(self, data: Any):
+        """Add the state in data that was returned by to_json. Raises ValueError,
+        TypeError, KeyError or AttributeError if data is not valid."""
+
+    @abstractmethod
+    def to_json(self) -> Any:
+        pass
+
+    def load(self, path: Path):
+        """Replace the state with the one of previous runs in a JSON file"""
+        self.clear()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.from_json(data)
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            LOGGER.warning("Ignoring %s in %s: %s", self.description, path, e)
+            self.clear()
+
+    def save(self, path: Path):
+        tmp_path = Path("{}.tmp".format(path))
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_json(), f)
+        tmp_path.replace(path)
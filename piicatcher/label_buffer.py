@@ -0,0 +1,102 @@
+"""Buffered writes of PII labels to the catalog
+
+Scans find labels one column at a time. ``Catalog.set_column_pii_type`` runs an
+UPDATE, a flush and a SELECT to refresh the column for every label, which is slow
+over the network. A LabelBuffer keeps the last label of every column id and writes
+all columns with the same label in one UPDATE. Scans flush the buffer at the end
+and before every commit, so labels are in the session before a task is added to
+the catalog.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from dbcat.catalog import Catalog
+from dbcat.catalog.models import CatColumn
+from dbcat.catalog.pii_types import PiiType
+from sqlalchemy import update
+from sqlalchemy.orm.util import identity_key
+
+LOGGER = logging.getLogger(__name__)
+
+# Labels that are buffered before they are written
+LABEL_FLUSH_SIZE = 1000
+
+# Column ids in the IN clause of one UPDATE. SQLite allows 999 parameters.
+MAX_IDS_PER_UPDATE = 500
+
+
+class LabelBuffer:
+    """Maps column id -> (PiiType, plugin). Not thread safe. Labels are written in
+    the session of the thread that flushes."""
+
+    def __init__(self, catalog: Catalog, flush_size: int = LABEL_FLUSH_SIZE):
+        self.catalog = catalog
+        self.flush_size = flush_size
+        self._labels: Dict[int, Tuple[Optional[PiiType], Optional[str]]] = {}
+        self.written = 0
+        self.statements = 0
+
+    def add(self, column: Any, pii_type: Optional[PiiType], pii_plugin: Optional[str]):
+        """Buffer a label of a CatColumn or ColumnInfo. A later label of the same
+        column replaces an earlier one like consecutive updates would."""
+        self._labels[column.id] = (pii_type, pii_plugin)
+        if len(self._labels) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the buffered labels and return the no. of labelled columns"""
+        if len(self._labels) == 0:
+            return 0
+        groups: Dict[Tuple, Tuple[Optional[PiiType], Optional[str], List[int]]] = {}
+        for column_id, (pii_type, pii_plugin) in self._labels.items():
+            # PiiType is a pydantic model and is not hashable
+            key = (
+                (pii_type.type, pii_type.name) if pii_type is not None else None,
+                pii_plugin,
+            )
+            groups.setdefault(key, (pii_type, pii_plugin, []))[2].append(column_id)
+
+        for pii_type, pii_plugin, column_ids in groups.values():
+            for start in range(0, len(column_ids), MAX_IDS_PER_UPDATE):
+                self._write(
+                    pii_type,
+                    pii_plugin,
+                    column_ids[start : start + MAX_IDS_PER_UPDATE],
+                )
+        self._expire(self._labels.keys())
+
+        flushed = len(self._labels)
+        LOGGER.debug("Wrote %d labels in %d groups", flushed, len(groups))
+        self.written += flushed
+        self._labels = {}
+        return flushed
+
+    def _write(
+        self,
+        pii_type: Optional[PiiType],
+        pii_plugin: Optional[str],
+        column_ids: List[int],
+    ):
+        stmt = (
+            update(CatColumn)
+            .where(CatColumn.id.in_(column_ids))
+            .values(dict(pii_type=pii_type, pii_plugin=pii_plugin))
+        )
+        self.catalog.get_scoped_session().execute(stmt)
+        self.statements += 1
+
+    def _expire(self, column_ids):
+        """Columns in the session are reloaded with their labels when they are
+        read again"""
+        session = self.catalog.get_scoped_session()
+        for column_id in column_ids:
+            column = session.identity_map.get(identity_key(CatColumn, column_id))
+            if column is not None:
+                session.expire(column)
+
+    def items(self):
+        """(column id, (PiiType, plugin)) of the buffered labels"""
+        return self._labels.items()
+
+    def __len__(self) -> int:
+        return len(self._labels)
@@ -0,0 +1,213 @@
+"""In-memory mirror of the catalog for one scan
+
+A scan walks the columns of a source in the catalog many times: to count them, to
+scan their names, once per table to sample their values and again to print the
+output. A CatalogMirror reads the tables and the columns of a source once and
+indexes them by table. Scans read the columns that match the filters from the
+mirror and add labels to its LabelBuffer which is written to the catalog once when
+the mirror is flushed. The output is then generated from the mirror. Like the output
+of a scan without a mirror, it has the columns of all the tables of the source.
+
+The mirror holds all the columns of the scan in memory. Use chunked sessions in
+piicatcher.scanner to bound memory instead.
+"""
+import datetime
+import logging
+import sys
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Set, Tuple
+
+from dbcat.catalog import Catalog
+from dbcat.catalog.models import CatColumn, CatSchema, CatSource, CatTable
+from dbcat.catalog.pii_types import PiiType
+from sqlalchemy.orm import contains_eager
+
+from piicatcher.detectors import ColumnInfo
+from piicatcher.generators import (
+    COLUMN_BATCH_SIZE,
+    SMALL_TABLE_MAX,
+    _table_filter,
+    sample_tables,
+    schema_ids,
+)
+from piicatcher.label_buffer import LabelBuffer
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MirrorColumn(NamedTuple):
+    """A column of the output with its label"""
+
+    name: str
+    data_type: str
+    sort_order: int
+    pii_type: Optional[PiiType]
+    pii_plugin: Optional[str]
+
+
+class CatalogMirror:
+    """Tables and columns of a source in the order of column_generator. Columns
+    are ColumnInfo. Not thread safe."""
+
+    def __init__(self, catalog: Catalog, source: CatSource):
+        self.catalog = catalog
+        self.source = source
+        # Labels are written when the mirror is flushed
+        self.labels = LabelBuffer(catalog, flush_size=sys.maxsize)
+        # Tables to scan and tables of the output
+        self._tables: List[Tuple[CatSchema, CatTable]] = []
+        self._output_tables: List[Tuple[CatSchema, CatTable]] = []
+        self._columns: Dict[int, List[ColumnInfo]] = {}
+        self._written: Dict[int, Tuple[Optional[PiiType], Optional[str]]] = {}
+
+    @classmethod
+    def load(
+        cls,
+        catalog: Catalog,
+        source: CatSource,
+        last_run: Optional[datetime.datetime] = None,
+        include_schema_regex_str: List[str] = None,
+        exclude_schema_regex_str: List[str] = None,
+        include_table_regex_str: List[str] = None,
+        exclude_table_regex_str: List[str] = None,
+    ) -> "CatalogMirror":
+        """Read the tables and the columns that column_generator generates with one
+        query each. The filters select the columns to scan. The output has the
+        columns of all the tables like output_dict and output_tabular."""
+        mirror = cls(catalog, source)
+        ids = schema_ids(catalog, source)
+        if len(ids) == 0:
+            return mirror
+        scan_ids = schema_ids(
+            catalog, source, include_schema_regex_str, exclude_schema_regex_str
+        )
+        scanned: Set[int] = set()
+        session = catalog.get_scoped_session()
+        if len(scan_ids) > 0:
+            clause, table_ids = _table_filter(
+                catalog, scan_ids, include_table_regex_str, exclude_table_regex_str
+            )
+            scanned = {
+                table_id
+                for table_id, in session.query(CatTable.id)
+                .filter(CatTable.schema_id.in_(scan_ids))
+                .filter(clause)
+                if table_ids is None or table_id in table_ids
+            }
+
+        tables = {
+            table.id: table
+            for table in session.query(CatTable)
+            .join(CatTable.schema)
+            .options(contains_eager(CatTable.schema))
+            .filter(CatSchema.id.in_(ids))
+        }
+
+        query = (
+            session.query(
+                CatColumn.id,
+                CatColumn.name,
+                CatColumn.data_type,
+                CatColumn.sort_order,
+                CatColumn.pii_type,
+                CatColumn.pii_plugin,
+                CatColumn.table_id,
+            )
+            .join(CatColumn.table)
+            .filter(CatTable.schema_id.in_(ids))
+            .order_by(CatTable.schema_id, CatColumn.table_id, CatColumn.sort_order)
+        )
+        if last_run is not None:
+            query = query.filter(CatColumn.updated_at > last_run)
+
+        count = 0
+        for (
+            column_id,
+            name,
+            data_type,
+            sort_order,
+            pii_type,
+            pii_plugin,
+            table_id,
+        ) in query.yield_per(COLUMN_BATCH_SIZE):
+            table = tables.get(table_id)
+            if table is None:
+                continue
+            columns = mirror._columns.get(table_id)
+            if columns is None:
+                columns = mirror._columns[table_id] = []
+                mirror._output_tables.append((table.schema, table))
+                if table_id in scanned:
+                    mirror._tables.append((table.schema, table))
+            columns.append(
+                ColumnInfo(
+                    column_id,
+                    name,
+                    data_type,
+                    sort_order,
+                    (source.name, table.schema.name, table.name, name),
+                )
+            )
+            mirror._written[column_id] = (pii_type, pii_plugin)
+            count += 1
+
+        LOGGER.info(
+            "Loaded %d tables and %d columns of %s into the mirror. Scan %d tables",
+            len(mirror._output_tables),
+            count,
+            source.name,
+            len(mirror._tables),
+        )
+        return mirror
+
+    def columns(self) -> Generator[Tuple[CatSchema, CatTable, ColumnInfo], None, None]:
+        """Generate (schema, table, column) like column_generator"""
+        for schema, table in self._tables:
+            for column in self._columns[table.id]:
+                yield schema, table, column
+
+    def count_columns(self) -> Dict[Optional[str], int]:
+        """No. of columns per data type like count_columns"""
+        counts: Dict[Optional[str], int] = {}
+        for _, _, column in self.columns():
+            counts[column.data_type] = counts.get(column.data_type, 0) + 1
+        return counts
+
+    def data_generator(
+        self,
+        sample_size=SMALL_TABLE_MAX,
+        decided_columns: Optional[Set[int]] = None,
+        include_numeric: bool = False,
+    ) -> Generator[Tuple[CatSchema, CatTable, ColumnInfo, Any], None, None]:
+        """Generate (schema, table, column, value) like data_generator. Only the
+        values are read from the source."""
+        return sample_tables(
+            source=self.source,
+            tables=self._tables,
+            get_columns=lambda table: self._columns[table.id],
+            sample_size=sample_size,
+            decided_columns=decided_columns,
+            include_numeric=include_numeric,
+        )
+
+    def flush(self) -> int:
+        """Write the labels of the scans to the catalog and return the no. of
+        labelled columns"""
+        for column_id, label in self.labels.items():
+            self._written[column_id] = label
+        return self.labels.flush()
+
+    def output_columns(
+        self,
+    ) -> Generator[Tuple[CatSchema, CatTable, MirrorColumn], None, None]:
+        """Generate (schema, table, column) of all the tables with the labels that
+        are flushed"""
+        for schema, table in self._output_tables:
+            for column in self._columns[table.id]:
+                pii_type, pii_plugin = self._written[column.id]
+                yield schema, table, MirrorColumn(
+                    column.name,
+                    column.data_type,
+                    column.sort_order,
+                    pii_type,
+                    pii_plugin,
+                )
@@ -0,0 +1,112 @@
+"""Results of metadata detectors per column name that are kept across runs
+
+Column names like id, created_at and email repeat in many tables and sources. A
+detector that returns a key from ``name_key`` is only called once per key. The cache
+is tagged with a hash of the names and versions of the detectors in the scan. It is
+cleared when a scan runs with other detectors or versions.
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from dbcat.catalog.pii_types import PiiType
+
+from piicatcher.json_state import JsonState
+
+LOGGER = logging.getLogger(__name__)
+
+NAME_CACHE_FILE = "name_cache.json"
+
+# Keys after this limit are not cached
+MAX_NAMES = 1000000
+
+
+def detectors_key(detectors: List[Any]) -> str:
+    """Hash of the class, name and version of every detector"""
+    fingerprint = [
+        [
+            "{}.{}".format(type(d).__module__, type(d).__qualname__),
+            d.name,
+            str(getattr(d, "version", "")),
+        ]
+        for d in detectors
+    ]
+    return hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()
+
+
+class NameCache(JsonState):
+    """Maps detector name -> key -> PiiType or None"""
+
+    description = "name cache"
+
+    def __init__(self):
+        self.key: Optional[str] = None
+        self.results: Dict[str, Dict[str, Optional[PiiType]]] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, key: str):
+        """Clear the cache if it has results of other detectors"""
+        if key != self.key:
+            if self._size > 0:
+                LOGGER.info("Detectors changed. Clearing the name cache.")
+            self.clear()
+            self.key = key
+
+    def get(self, detector_name: str, key: Optional[str]) -> Tuple[bool, Any]:
+        """Returns (found, result)"""
+        results = self.results.get(detector_name)
+        if key is None or results is None or key not in results:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, results[key]
+
+    def put(self, detector_name: str, key: str, result: Optional[PiiType]):
+        results = self.results.setdefault(detector_name, {})
+        if key not in results:
+            if self._size >= MAX_NAMES:
+                return
+            self._size += 1
+        results[key] = result
+
+    def clear(self):
+        self.key = None
+        self.results = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._size}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def from_json(self, data: Dict[str, Any]):
+        self.key = data["key"]
+        for detector_name, results in data["results"].items():
+            for key, result in results.items():
+                self.put(
+                    detector_name,
+                    key,
+                    PiiType.parse_obj(result) if result is not None else None,
+                )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "results": {
+                detector_name: {
+                    key: result.dict() if result is not None else None
+                    for key, result in results.items()
+                }
+                for detector_name, results in self.results.items()
+            },
+        }
+
+
+# Shared by all scans in a process
+name_cache = NameCache()
@@ -1,5 +1,5 @@
 import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from dbcat.catalog import Catalog, CatSchema, CatSource, CatTable
 
@@ -15,6 +15,7 @@ def output_dict(
     exclude_schema_regex: List[str] = None,
     include_table_regex: List[str] = None,
     exclude_table_regex: List[str] = None,
+    generator: Optional[Iterable[Tuple[CatSchema, CatTable, Any]]] = None,
 ) -> Dict[Any, Any]:
     current_schema: Optional[CatSchema] = None
     current_table: Optional[CatTable] = None
@@ -23,15 +24,17 @@ def output_dict(
     schema_dict = {"name": "", "tables": []}
 
     table_dict = {"name": "", "columns": []}
-    for schema, table, column in column_generator(
-        catalog=catalog,
-        source=source,
-        last_run=last_run,
-        exclude_schema_regex_str=exclude_schema_regex,
-        include_schema_regex_str=include_schema_regex,
-        exclude_table_regex_str=exclude_table_regex,
-        include_table_regex_str=include_table_regex,
-    ):
+    if generator is None:
+        generator = column_generator(
+            catalog=catalog,
+            source=source,
+            last_run=last_run,
+            exclude_schema_regex_str=exclude_schema_regex,
+            include_schema_regex_str=include_schema_regex,
+            exclude_table_regex_str=exclude_table_regex,
+            include_table_regex_str=include_table_regex,
+        )
+    for schema, table, column in generator:
         if current_schema is None or schema != current_schema:
             if current_schema is not None:
                 if len(table_dict["columns"]) > 0 or list_all:
@@ -77,18 +80,21 @@ def output_tabular(
     exclude_schema_regex: List[str] = None,
     include_table_regex: List[str] = None,
     exclude_table_regex: List[str] = None,
+    generator: Optional[Iterable[Tuple[CatSchema, CatTable, Any]]] = None,
 ) -> List[Any]:
     tabular = []
 
-    for schema, table, column in column_generator(
-        catalog=catalog,
-        source=source,
-        last_run=last_run,
-        exclude_schema_regex_str=exclude_schema_regex,
-        include_schema_regex_str=include_schema_regex,
-        exclude_table_regex_str=exclude_table_regex,
-        include_table_regex_str=include_table_regex,
-    ):
+    if generator is None:
+        generator = column_generator(
+            catalog=catalog,
+            source=source,
+            last_run=last_run,
+            exclude_schema_regex_str=exclude_schema_regex,
+            include_schema_regex_str=include_schema_regex,
+            exclude_table_regex_str=exclude_table_regex,
+            include_table_regex_str=include_table_regex,
+        )
+    for schema, table, column in generator:
         if list_all or column.pii_type is not None:
             tabular.append(
                 [
@@ -0,0 +1,173 @@
+"""Progress of scans
+
+Scans report progress once per table, schema or chunk of columns instead of once per
+value. A reporter shows a progress bar on a terminal, logs periodic JSON records for
+jobs without a terminal or does nothing.
+"""
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+from tqdm import tqdm
+
+LOGGER = logging.getLogger(__name__)
+
+progress_logger = logging.getLogger("piicatcher.progress")
+progress_logger.propagate = False
+progress_logger.setLevel(logging.INFO)
+progress_logger.addHandler(logging.NullHandler())
+
+
+class ProgressReporter(ABC):
+    """Reports the progress of one scan at a time. start() returns the reporter so
+    that it can be used in a with statement which closes it."""
+
+    name: str
+
+    @abstractmethod
+    def start(self, desc: str, total: Optional[int], unit: str) -> "ProgressReporter":
+        """Start a scan of total units. total is None if it is not known"""
+
+    @abstractmethod
+    def update(self, count: int, table: Optional[str] = None):
+        """count units of table are done"""
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def __enter__(self) -> "ProgressReporter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NullProgress(ProgressReporter):
+    name = "none"
+
+    def start(self, desc: str, total: Optional[int], unit: str) -> ProgressReporter:
+        return self
+
+    def update(self, count: int, table: Optional[str] = None):
+        pass
+
+    def close(self):
+        pass
+
+
+class TtyProgress(ProgressReporter):
+    """Progress bar that is redrawn at most once in min_interval seconds"""
+
+    name = "tty"
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self._bar: Optional[tqdm] = None
+
+    def start(self, desc: str, total: Optional[int], unit: str) -> ProgressReporter:
+        self.close()
+        self._bar = tqdm(
+            total=total, desc=desc, unit=unit, mininterval=self.min_interval
+        )
+        return self
+
+    def update(self, count: int, table: Optional[str] = None):
+        if self._bar is not None:
+            if table is not None:
+                self._bar.set_postfix_str(table, refresh=False)
+            self._bar.update(count)
+
+    def close(self):
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
+
+
+class JsonLogProgress(ProgressReporter):
+    """Logs a record to the piicatcher.progress logger at most once in interval
+    seconds and when a scan is closed. The CLI writes the records as JSON."""
+
+    name = "json"
+
+    def __init__(
+        self, interval: float = 10.0, clock: Callable[[], float] = time.monotonic
+    ):
+        self.interval = interval
+        self._clock = clock
+        self._desc: Optional[str] = None
+        self._total: Optional[int] = None
+        self._unit = ""
+        self._done = 0
+        self._tables = 0
+        self._table: Optional[str] = None
+        self._started = 0.0
+        self._logged = 0.0
+
+    def start(self, desc: str, total: Optional[int], unit: str) -> ProgressReporter:
+        self.close()
+        self._desc = desc
+        self._total = total
+        self._unit = unit
+        self._done = 0
+        self._tables = 0
+        self._table = None
+        self._started = self._logged = self._clock()
+        return self
+
+    def update(self, count: int, table: Optional[str] = None):
+        if self._desc is None:
+            return
+        self._done += count
+        self._tables += 1
+        self._table = table
+        now = self._clock()
+        if now - self._logged >= self.interval:
+            self._log(now, finished=False)
+
+    def close(self):
+        if self._desc is not None:
+            self._log(self._clock(), finished=True)
+            self._desc = None
+
+    def record(self, now: float, finished: bool) -> Dict[str, Any]:
+        elapsed = now - self._started
+        return {
+            "desc": self._desc,
+            "unit": self._unit,
+            "done": self._done,
+            "total": self._total,
+            "tables": self._tables,
+            "table": self._table,
+            "elapsed": round(elapsed, 3),
+            "rate": round(self._done / elapsed, 3) if elapsed > 0 else None,
+            "finished": finished,
+        }
+
+    def _log(self, now: float, finished: bool):
+        self._logged = now
+        progress_logger.info("progress", extra=self.record(now, finished))
+
+
+_reporters = {
+    NullProgress.name: NullProgress,
+    TtyProgress.name: TtyProgress,
+    JsonLogProgress.name: JsonLogProgress,
+}
+
+
+def load_reporter(name: str = "auto") -> ProgressReporter:
+    """Load a reporter by name. auto chooses tty if stderr is a terminal and json
+    otherwise."""
+    if name == "auto":
+        name = TtyProgress.name if sys.stderr.isatty() else JsonLogProgress.name
+    if name not in _reporters:
+        raise ValueError(
+            "Unknown progress reporter {}. Choose one of auto, {}".format(
+                name, ", ".join(_reporters.keys())
+            )
+        )
+    LOGGER.debug("Progress reporter: %s", name)
+    return _reporters[name]()
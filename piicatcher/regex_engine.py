@@ -0,0 +1,353 @@
+"""Match many regular expressions in one pass
+
+The regular expressions are compiled with a configurable backend. google-re2 and
+Hyperscan are used if they are installed. Patterns that are not supported by a
+backend, for e.g. lookarounds in re2, fall back to the re module.
+"""
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+_global_flags = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+class UnsupportedPattern(Exception):
+    """Raised by a backend if it cannot compile a pattern"""
+
+
+class RegexBackend(ABC):
+    name: str
+
+    @abstractmethod
+    def compile(self, pattern: str, flags: int = 0) -> Any:
+        """Return an object with a search(text) method that returns None if there is
+        no match. Raise UnsupportedPattern if the backend cannot compile the pattern"""
+
+
+class ReBackend(RegexBackend):
+    name = "re"
+
+    def compile(self, pattern: str, flags: int = 0) -> Any:
+        return re.compile(pattern, flags)
+
+
+class Re2Backend(RegexBackend):
+    """Linear time matching with google-re2. It does not support lookarounds and
+    backreferences."""
+
+    name = "re2"
+
+    def __init__(self):
+        import re2  # pylint: disable=import-outside-toplevel
+
+        self._re2 = re2
+
+    def compile(self, pattern: str, flags: int = 0) -> Any:
+        if flags & ~(re.IGNORECASE | re.MULTILINE):
+            raise UnsupportedPattern("Unsupported flags: {}".format(flags))
+        inline = ("i" if flags & re.IGNORECASE else "") + (
+            "m" if flags & re.MULTILINE else ""
+        )
+        if inline:
+            pattern = "(?{}){}".format(inline, pattern)
+        try:
+            return self._re2.compile(pattern)
+        except self._re2.error as e:
+            raise UnsupportedPattern(str(e))
+
+
+class _HyperscanPattern:
+    def __init__(self, hyperscan, database):
+        self._hyperscan = hyperscan
+        self._database = database
+
+    def search(self, text: str) -> Optional[bool]:
+        matched = []
+
+        def on_match(id, start, end, flags, context):
+            matched.append(id)
+            return True
+
+        try:
+            self._database.scan(text.encode("utf-8"), match_event_handler=on_match)
+        except self._hyperscan.error:
+            # The handler stops the scan at the first match. Some versions of
+            # python-hyperscan raise an error for that.
+            if len(matched) == 0:
+                raise
+        return True if len(matched) > 0 else None
+
+
+class HyperscanBackend(RegexBackend):
+    """Multi-pattern matching with Hyperscan. It does not support lookarounds,
+    backreferences and word boundaries in UTF-8 mode."""
+
+    name = "hyperscan"
+
+    def __init__(self):
+        import hyperscan  # pylint: disable=import-outside-toplevel
+
+        self._hyperscan = hyperscan
+
+    def compile(self, pattern: str, flags: int = 0) -> Any:
+        hs = self._hyperscan
+        if flags & ~(re.IGNORECASE | re.MULTILINE):
+            raise UnsupportedPattern("Unsupported flags: {}".format(flags))
+        hs_flags = hs.HS_FLAG_SINGLEMATCH | hs.HS_FLAG_UTF8 | hs.HS_FLAG_UCP
+        if flags & re.IGNORECASE:
+            hs_flags |= hs.HS_FLAG_CASELESS
+        if flags & re.MULTILINE:
+            hs_flags |= hs.HS_FLAG_MULTILINE
+
+        database = hs.Database(mode=hs.HS_MODE_BLOCK)
+        try:
+            database.compile(
+                expressions=[pattern.encode("utf-8")],
+                ids=[0],
+                elements=1,
+                flags=[hs_flags],
+            )
+        except hs.error as e:
+            raise UnsupportedPattern(str(e))
+        return _HyperscanPattern(hs, database)
+
+
+_backends: Dict[str, Callable[[], RegexBackend]] = {
+    ReBackend.name: ReBackend,
+    Re2Backend.name: Re2Backend,
+    HyperscanBackend.name: HyperscanBackend,
+}
+
+_re_backend = ReBackend()
+_current_backend: RegexBackend = _re_backend
+
+
+def load_backend(name: str = "auto") -> RegexBackend:
+    """Load a backend by name. auto chooses re2, Hyperscan and re in that order
+    depending on which one is installed."""
+    if name == "auto":
+        for candidate in [Re2Backend, HyperscanBackend]:
+            try:
+                return candidate()
+            except ImportError:
+                LOGGER.debug("Regex backend %s is not installed", candidate.name)
+        return _re_backend
+
+    if name not in _backends:
+        raise ValueError(
+            "Unknown regex backend {}. Choose one of auto, {}".format(
+                name, ", ".join(_backends.keys())
+            )
+        )
+    if name == ReBackend.name:
+        return _re_backend
+    return _backends[name]()
+
+
+def set_backend(name: str = "auto") -> RegexBackend:
+    """Set the backend used by detectors that are created after this call"""
+    global _current_backend
+    _current_backend = load_backend(name)
+    LOGGER.info("Regex backend: %s", _current_backend.name)
+    return _current_backend
+
+
+def get_backend() -> RegexBackend:
+    return _current_backend
+
+
+def compile_pattern(
+    pattern: str, flags: int = 0, backend: Optional[RegexBackend] = None
+) -> Tuple[Any, RegexBackend]:
+    """Compile with the backend and fall back to re if it does not support the
+    pattern. Returns the compiled pattern and the backend that compiled it."""
+    if backend is None:
+        backend = get_backend()
+    if backend is not _re_backend:
+        try:
+            return backend.compile(pattern, flags), backend
+        except UnsupportedPattern as e:
+            LOGGER.debug(
+                "%s does not support '%s'. Using re. Error: %s",
+                backend.name,
+                pattern,
+                e,
+            )
+    return _re_backend.compile(pattern, flags), _re_backend
+
+
+def _scoped(pattern: str) -> str:
+    """Global flags like (?i) are only allowed at the start of a regex. Scope them to
+    the pattern so that it can be part of an alternation."""
+    match = _global_flags.match(pattern)
+    if match is None:
+        return "(?:{})".format(pattern)
+    return "(?{}:{})".format(match.group(1), pattern[match.end() :])
+
+
+class _FusedGroup(NamedTuple):
+    ranks: List[int]
+    combined: Any
+    batch: Any
+
+
+class FusedRegex:
+    """Compile a list of (name, pattern) in priority order into one alternation with
+    a named group per pattern.
+
+    ``search`` returns the name of the highest priority pattern that matches anywhere
+    in the text. It is the same result as searching the patterns one by one in
+    priority order. Text that does not match any pattern is scanned only once.
+
+    Patterns that the backend cannot compile are fused separately with re. Then text
+    without a match is scanned once per backend.
+    """
+
+    def __init__(
+        self, patterns: List[Tuple[str, str]], backend: Optional[RegexBackend] = None
+    ):
+        if backend is None:
+            backend = get_backend()
+        self.names: List[str] = [name for name, _ in patterns]
+        self._patterns: List[Any] = []
+        ranks_by_backend: Dict[str, Tuple[RegexBackend, List[int]]] = {}
+        for rank, (_, pattern) in enumerate(patterns):
+            compiled, used = compile_pattern(pattern, backend=backend)
+            self._patterns.append(compiled)
+            ranks_by_backend.setdefault(used.name, (used, []))[1].append(rank)
+
+        self._groups: List[_FusedGroup] = []
+        for used, ranks in ranks_by_backend.values():
+            combined = "|".join(
+                "(?P<_{}>{})".format(rank, _scoped(patterns[rank][1])) for rank in ranks
+            )
+            compiled, used = compile_pattern(combined, backend=used)
+            # ^ and $ have to match at the start and end of every text in a batch.
+            batch, _ = compile_pattern(combined, re.MULTILINE, backend=used)
+            self._groups.append(_FusedGroup(ranks, compiled, batch))
+        self._groups.sort(key=lambda group: group.ranks[0])
+
+    def _search_group(
+        self, group: _FusedGroup, text: str, skip: Collection[int]
+    ) -> Optional[int]:
+        match = group.combined.search(text)
+        if match is None:
+            return None
+
+        # The combined regex returns the left-most match. A pattern with a higher
+        # priority may still match further in the text. Some backends do not report
+        # the group. Then the match is from the last pattern if none of the others
+        # match.
+        lastgroup = getattr(match, "lastgroup", None)
+        matched = int(lastgroup[1:]) if lastgroup is not None else group.ranks[-1]
+        for rank in group.ranks:
+            if rank >= matched:
+                break
+            if rank not in skip and self._patterns[rank].search(text) is not None:
+                return rank
+
+        return matched
+
+    def _probe(
+        self, text: str, skip: Collection[int], probes: Sequence[int]
+    ) -> Tuple[Optional[int], Collection[int]]:
+        """Search the patterns in probes one by one. Returns the rank of the highest
+        priority match if one of them matches, and skip with the probes that missed.
+        """
+        missed = set()
+        for rank in probes:
+            if rank in skip or rank in missed:
+                continue
+            if self._patterns[rank].search(text) is None:
+                missed.add(rank)
+                continue
+            # Only patterns with a higher priority can change the result.
+            for higher in range(rank):
+                if (
+                    higher not in skip
+                    and higher not in missed
+                    and self._patterns[higher].search(text) is not None
+                ):
+                    return higher, skip
+            return rank, skip
+
+        return None, skip if len(missed) == 0 else missed.union(skip)
+
+    def search(
+        self, text: str, skip: Collection[int] = (), probes: Sequence[int] = ()
+    ) -> Optional[str]:
+        """Return the name of the highest priority pattern that matches.
+
+        ``skip`` has the ranks of patterns that are known to not match the text. They
+        are not searched again to resolve the priority.
+
+        ``probes`` has the ranks of patterns that are likely to match. They are tried
+        one by one before the combined regex. The result is the same.
+        """
+        if len(probes) > 0:
+            rank, skip = self._probe(text, skip, probes)
+            if rank is not None:
+                return self.names[rank]
+
+        best: Optional[int] = None
+        for group in self._groups:
+            if best is not None and group.ranks[0] > best:
+                break
+            if all(rank in skip for rank in group.ranks):
+                continue
+            rank = self._search_group(group, text, skip)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+
+        return self.names[best] if best is not None else None
+
+    def search_batch(
+        self,
+        texts: List[str],
+        skips: Optional[List[Collection[int]]] = None,
+        probes: Sequence[int] = (),
+    ) -> Optional[str]:
+        """Return the result of the first text in the batch that matches.
+
+        The batch is joined by new lines and searched once. A new line can only add
+        matches that span two texts as long as the patterns do not use \\A, \\Z or
+        look for new lines. So only batches with a match are searched text by text.
+        ``skips`` has the ranks to skip for every text. ``probes`` are passed on to
+        ``search``.
+        """
+        found = self.find_batch(texts, skips, probes)
+        return found[1] if found is not None else None
+
+    def find_batch(
+        self,
+        texts: List[str],
+        skips: Optional[List[Collection[int]]] = None,
+        probes: Sequence[int] = (),
+    ) -> Optional[Tuple[int, str]]:
+        """Like search_batch and return the index of the text as well"""
+        if len(texts) == 0:
+            return None
+
+        joined = "\n".join(texts)
+        if all(group.batch.search(joined) is None for group in self._groups):
+            return None
+
+        for index, text in enumerate(texts):
+            name = self.search(text, skips[index] if skips is not None else (), probes)
+            if name is not None:
+                return index, name
+
+        return None
@@ -0,0 +1,274 @@
+"""Run datum detectors with time budgets
+
+A detector can take very long on a single value, for e.g. a regular expression that
+backtracks. GuardedDetector stops a call that takes longer than its budget and skips
+a column once the detector has spent its budget on it. IsolatedDetector runs an
+untrusted detector in a subprocess that is killed if it does not respond in time.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
+
+from dbcat.catalog.models import CatColumn
+from dbcat.catalog.pii_types import PiiType
+
+from piicatcher.detectors import (
+    ColumnInfo,
+    DatumDetector,
+    DatumMatch,
+    detector_registry,
+)
+from piicatcher.regex_engine import get_backend, set_backend
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds a detector can spend on one call of detect or detect_batch
+DEFAULT_CALL_BUDGET = 5.0
+# Seconds a detector can spend on all the values of a column
+DEFAULT_COLUMN_BUDGET = 60.0
+
+
+class _Skipped:
+    def __repr__(self) -> str:
+        return "SKIPPED"
+
+
+# GuardedDetector returns SKIPPED for values that it did not scan because a call was
+# over budget or failed or the column was over budget. These values are not known
+# to be free of PII and are not cached.
+SKIPPED: Any = _Skipped()
+
+
+class DetectorTimeout(Exception):
+    """Raised when a call to a detector is over its budget"""
+
+
+class DetectorError(Exception):
+    """Raised when an isolated detector fails or its process exits"""
+
+
+def _alarm_available() -> bool:
+    # Signal handlers can only be set in the main thread
+    return (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+
+
+def _on_alarm(signum, frame):
+    raise DetectorTimeout()
+
+
+@contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """Raise DetectorTimeout in the block after seconds. The limit is not enforced if
+    seconds is None or if SIGALRM is not available, for e.g. on Windows or in a
+    thread."""
+    if seconds is None or not _alarm_available():
+        yield
+        return
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _isolated_main(conn, detector_class: Type[DatumDetector], regex_backend: str):
+    set_backend(regex_backend)
+    detector = detector_class()
+    while True:
+        try:
+            method, kwargs = conn.recv()
+        except EOFError:
+            break
+        try:
+            conn.send((True, getattr(detector, method)(**kwargs)))
+        except Exception as e:
+            conn.send((False, repr(e)))
+
+
+class IsolatedDetector(DatumDetector):
+    """Run a registered detector in a subprocess. Columns are sent as ColumnInfo.
+
+    A call that does not return in ``timeout`` seconds kills the subprocess and
+    raises DetectorTimeout. Exceptions in the detector raise DetectorError. A new
+    subprocess is started on the next call.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = DEFAULT_CALL_BUDGET):
+        self.name = name
+        # The class is pickled by reference. So the subprocess imports its module
+        # and it does not need the registry.
+        self._class = detector_registry.get(name)
+        self.context_free = self._class.context_free
+        self.numeric = self._class.numeric
+        self.timeout = timeout
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn: Any = None
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_isolated_main,
+            args=(child_conn, self._class, get_backend().name),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        LOGGER.debug("Started %s in process %d", self.name, self._process.pid)
+
+    def _call(self, method: str, **kwargs) -> Any:
+        if self._process is None or not self._process.is_alive():
+            self._start()
+        self._conn.send((method, kwargs))
+        if not self._conn.poll(self.timeout):
+            self.close()
+            raise DetectorTimeout()
+        try:
+            ok, result = self._conn.recv()
+        except EOFError:
+            self.close()
+            raise DetectorError("{} exited".format(self.name))
+        if not ok:
+            raise DetectorError(result)
+        return result
+
+    def detect(self, column: CatColumn, datum: str) -> Optional[PiiType]:
+        return self._call("detect", column=ColumnInfo.from_column(column), datum=datum)
+
+    def detect_batch(
+        self, column: CatColumn, values: List[Any]
+    ) -> Optional[DatumMatch]:
+        return self._call(
+            "detect_batch", column=ColumnInfo.from_column(column), values=values
+        )
+
+    def stats(self) -> Dict[str, int]:
+        if self._process is None or not self._process.is_alive():
+            return {}
+        try:
+            return self._call("stats")
+        except (DetectorTimeout, DetectorError):
+            return {}
+
+    def close(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+            self._process = None
+            self._conn = None
+
+
+class GuardedDetector(DatumDetector):
+    """Wrap a detector with a budget per call and per column.
+
+    If detect_batch is over budget, the values of the batch are tried one by one and
+    only the values that are over budget are skipped. Once the detector has spent
+    ``column_budget`` seconds on a column, the rest of the column is skipped. Errors
+    of isolated detectors skip the value as well. Columns and reasons are collected
+    in ``report``.
+
+    detect and detect_batch return SKIPPED instead of None if values were skipped
+    and no PII was found in the rest.
+    """
+
+    def __init__(
+        self,
+        detector: DatumDetector,
+        call_budget: Optional[float] = DEFAULT_CALL_BUDGET,
+        column_budget: Optional[float] = DEFAULT_COLUMN_BUDGET,
+    ):
+        self.detector = detector
+        self.name = detector.name
+        self.context_free = detector.context_free
+        self.numeric = detector.numeric
+        self.call_budget = call_budget
+        self.column_budget = column_budget
+        self.report: List[Dict[str, Any]] = []
+        self._spent: Dict[Any, float] = {}
+        self._skipped_columns: Set[Any] = set()
+        self._reported: Set[Tuple[Any, str]] = set()
+        self._counters: Counter = Counter()
+
+    def _report(self, column: Any, reason: str):
+        key = getattr(column, "id", None)
+        if (key, reason) in self._reported:
+            return
+        self._reported.add((key, reason))
+        fqdn = getattr(column, "fqdn", None)
+        LOGGER.warning("%s skipped values of %s: %s", self.name, fqdn, reason)
+        self.report.append({"column": fqdn, "detector": self.name, "reason": reason})
+
+    def _run(
+        self, column: Any, method: Callable[..., Any], **kwargs
+    ) -> Tuple[bool, Any]:
+        """Returns (False, None) if the call was over budget or failed"""
+        key = getattr(column, "id", None)
+        if key in self._skipped_columns:
+            return False, None
+
+        start = time.perf_counter()
+        try:
+            if isinstance(self.detector, IsolatedDetector):
+                self.detector.timeout = self.call_budget
+                return True, method(column=column, **kwargs)
+            with time_limit(self.call_budget):
+                return True, method(column=column, **kwargs)
+        except DetectorTimeout:
+            self._counters["guard_timeouts"] += 1
+            self._report(column, "call over {}s".format(self.call_budget))
+            return False, None
+        except DetectorError as e:
+            self._counters["guard_errors"] += 1
+            self._report(column, "error {}".format(e))
+            return False, None
+        finally:
+            spent = self._spent.get(key, 0.0) + time.perf_counter() - start
+            self._spent[key] = spent
+            if self.column_budget is not None and spent > self.column_budget:
+                self._skipped_columns.add(key)
+                self._counters["guard_columns_skipped"] += 1
+                self._report(column, "column over {}s".format(self.column_budget))
+
+    def detect(self, column: CatColumn, datum: str) -> Optional[PiiType]:
+        ok, pii_type = self._run(column, self.detector.detect, datum=datum)
+        if not ok:
+            self._counters["guard_values_skipped"] += 1
+            return SKIPPED
+        return pii_type
+
+    def detect_batch(
+        self, column: CatColumn, values: List[Any]
+    ) -> Optional[DatumMatch]:
+        ok, match = self._run(column, self.detector.detect_batch, values=values)
+        if ok:
+            return match
+
+        skipped = False
+        for datum in values:
+            pii_type = self.detect(column=column, datum=datum)
+            if pii_type is SKIPPED:
+                skipped = True
+            elif pii_type is not None:
+                return DatumMatch(pii_type, datum)
+        return SKIPPED if skipped else None
+
+    def take_report(self) -> List[Dict[str, Any]]:
+        report, self.report = self.report, []
+        return report
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self.detector.stats())
+        stats.update(self._counters)
+        return stats
@@ -1,13 +1,36 @@
 """Different types of scanners for PII data"""
+import bisect
+import datetime
+import hashlib
+import json
 import logging
+import math
+import multiprocessing
 import re
-from typing import Generator, List, Optional, Tuple
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
 
 import crim as CommonRegex
 from dbcat.catalog import Catalog
-from dbcat.catalog.models import CatColumn, CatSchema, CatTable
+from dbcat.catalog.models import CatColumn, CatSchema, CatSource, CatTable
 from dbcat.catalog.pii_types import PiiType
-from tqdm import tqdm
 
 from piicatcher import (
     SSN,
@@ -24,11 +47,46 @@ from piicatcher import (
     UserName,
     ZipCode,
 )
-from piicatcher.detectors import DatumDetector, MetadataDetector, register_detector
-from piicatcher.generators import SMALL_TABLE_MAX, _filter_text_columns
+from piicatcher.automaton import KeywordAutomaton, literal_keywords
+from piicatcher.cache import detection_cache, value_key
+from piicatcher.detectors import (
+    ColumnInfo,
+    DatumDetector,
+    DatumMatch,
+    MetadataDetector,
+    detector_registry,
+    register_detector,
+)
+from piicatcher.generators import (
+    SMALL_TABLE_MAX,
+    _is_numeric_column,
+    column_batches,
+    schema_columns,
+    schema_ids,
+)
+from piicatcher.hit_stats import column_family, hit_stats
+from piicatcher.label_buffer import LabelBuffer
+from piicatcher.name_cache import detectors_key, name_cache
+from piicatcher.progress import ProgressReporter, load_reporter
+from piicatcher.regex_engine import (
+    FusedRegex,
+    compile_pattern,
+    get_backend,
+    set_backend,
+)
+from piicatcher.runner import (
+    DEFAULT_CALL_BUDGET,
+    DEFAULT_COLUMN_BUDGET,
+    SKIPPED,
+    GuardedDetector,
+    IsolatedDetector,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+DATUM_BATCH_SIZE = 20
+# Number of columns passed to MetadataDetector.detect_many in one call
+METADATA_CHUNK_SIZE = 5000
 
 data_logger = logging.getLogger("piicatcher.data")
 data_logger.propagate = False
@@ -88,38 +146,356 @@ class ColumnNameRegexDetector(MetadataDetector):
 
     name = "ColumnNameRegexDetector"
 
+    def __init__(self):
+        # All patterns are anchored at the start. So search is the same as match.
+        self._compiled = [
+            (pii_type, compile_pattern(ex.pattern, ex.flags & re.IGNORECASE)[0])
+            for pii_type, ex in self.regex.items()
+        ]
+
+        # Patterns like ^.*(a|b).*$ match if the name has one of the keywords. They
+        # are matched in one pass by an automaton. Other patterns are searched.
+        self._types = list(self.regex.keys())
+        keywords: List[Tuple[int, str]] = []
+        self._other: List[Tuple[int, Any]] = []
+        for rank, (pii_type, ex) in enumerate(self.regex.items()):
+            words = literal_keywords(ex)
+            if words is None:
+                self._other.append((rank, self._compiled[rank][1]))
+            else:
+                keywords.extend((rank, word) for word in words)
+        self._automaton = KeywordAutomaton(keywords)
+
+        # Results are cached by name. A subclass with other patterns gets another
+        # version so that it does not use the results of this class.
+        patterns = [[ex.pattern, ex.flags] for ex in self.regex.values()]
+        self.version = "1:" + hashlib.sha256(json.dumps(patterns).encode()).hexdigest()
+        self._ignore_case = all(ex.flags & re.IGNORECASE for ex in self.regex.values())
+
+    def name_key(self, column: CatColumn) -> Optional[str]:
+        name = column.name
+        # Lower case of non-ASCII characters can match differently
+        if self._ignore_case and name.isascii():
+            return name.lower()
+        return name
+
     def detect(self, column: CatColumn) -> Optional[PiiType]:
-        for pii_type, ex in self.regex.items():
-            if ex.match(column.name) is not None:
-                return pii_type()
+        name = column.name
+        # Case insensitive regexes match some non-ASCII characters like the
+        # Kelvin sign with ASCII letters. . does not match a new line.
+        if not name.isascii() or "\n" in name:
+            for pii_type, ex in self._compiled:
+                if ex.search(name) is not None:
+                    return pii_type()
+            return None
 
-        return None
+        best = self._automaton.search(name.lower())
+        for rank, ex in self._other:
+            if best is not None and rank > best:
+                break
+            if ex.search(name) is not None:
+                best = rank
+                break
+
+        return self._types[best]() if best is not None else None
+
+    def detect_many(self, columns: List[CatColumn]) -> List[Optional[PiiType]]:
+        # Many tables have columns with the same name. Each name is matched once.
+        results: Dict[str, Optional[PiiType]] = {}
+        detected: List[Optional[PiiType]] = []
+        for column in columns:
+            name = column.name
+            if name not in results:
+                results[name] = self.detect(column)
+            detected.append(results[name])
+        return detected
+
+
+def _detect_many_cached(
+    detector: MetadataDetector, columns: List[CatColumn]
+) -> List[Optional[PiiType]]:
+    """Run detect_many on the columns that are not in the name cache and cache their
+    results"""
+    keys = [detector.name_key(column) for column in columns]
+    pii_types: List[Optional[PiiType]] = [None] * len(columns)
+    missing = []
+    # Index of the column that is scanned for a key that is not in the cache
+    first: Dict[str, int] = {}
+    for index, key in enumerate(keys):
+        found, pii_type = name_cache.get(detector.name, key)
+        if found:
+            pii_types[index] = pii_type
+        elif key is None:
+            missing.append(index)
+        elif key not in first:
+            first[key] = index
+            missing.append(index)
+
+    if len(missing) > 0:
+        detected = detector.detect_many([columns[index] for index in missing])
+        for index, pii_type in zip(missing, detected):
+            pii_types[index] = pii_type
+            key = keys[index]
+            if key is not None:
+                name_cache.put(detector.name, key, pii_type)
+        for index, key in enumerate(keys):
+            if key is not None and first.get(key, index) != index:
+                pii_types[index] = pii_types[first[key]]
+    return pii_types
+
+
+def _label_columns(
+    labels: LabelBuffer, detectors: List[MetadataDetector], columns: List[CatColumn]
+) -> int:
+    """Label a chunk of columns and return the number of labeled columns. Detectors
+    are called in order on the columns that are not labeled yet. So every column
+    gets the type of the first detector that finds PII like a scan column by
+    column."""
+    remaining = columns
+    set_number = 0
+    for detector in detectors:
+        if len(remaining) == 0:
+            break
+        pii_types = _detect_many_cached(detector, remaining)
+        unlabeled = []
+        for column, pii_type in zip(remaining, pii_types):
+            if pii_type is None:
+                unlabeled.append(column)
+                continue
+            set_number += 1
+            labels.add(column, pii_type, detector.name)
+        remaining = unlabeled
+    return set_number
 
 
 def metadata_scan(
     catalog: Catalog,
     detectors: List[MetadataDetector],
-    work_generator: Generator[Tuple[CatSchema, CatTable, CatColumn], None, None],
     generator: Generator[Tuple[CatSchema, CatTable, CatColumn], None, None],
+    total_columns: Optional[int] = None,
+    chunk_size: int = METADATA_CHUNK_SIZE,
+    progress: Optional[ProgressReporter] = None,
+    labels: Optional[LabelBuffer] = None,
 ):
-    total_columns = len([c for s, t, c in work_generator])
+    """Label columns by name. total_columns is only used to show progress and can
+    be computed with piicatcher.generators.count_columns. Progress is reported
+    once per chunk by a reporter of piicatcher.progress. Labels are buffered and
+    written in bulk by piicatcher.label_buffer before the scan returns. If labels
+    is given, they are added to it and the caller writes them."""
+    name_cache.bind(detectors_key(detectors))
+    if progress is None:
+        progress = load_reporter()
+    owned = labels is None
+    if labels is None:
+        labels = LabelBuffer(catalog)
     counter = 0
     set_number = 0
-    for schema, table, column in tqdm(
-        generator, total=total_columns, desc="columns", unit="columns"
+    chunk: List[CatColumn] = []
+    with progress.start("columns", total_columns, "columns"):
+        for schema, table, column in generator:
+            counter += 1
+            LOGGER.debug("Scanning column name %s", column.fqdn)
+            chunk.append(column)
+            if len(chunk) >= chunk_size:
+                set_number += _label_columns(labels, detectors, chunk)
+                progress.update(len(chunk))
+                chunk = []
+
+        if len(chunk) > 0:
+            set_number += _label_columns(labels, detectors, chunk)
+            progress.update(len(chunk))
+        if owned:
+            labels.flush()
+
+    LOGGER.info("Columns Scanned: %d, Columns Labeled: %d", counter, set_number)
+    LOGGER.info("Name Cache: %s", name_cache.stats())
+
+
+def _map_bounded(
+    executor: ThreadPoolExecutor, func: Callable, items: List[Any], limit: int
+) -> Iterator[Any]:
+    """Like executor.map with at most limit calls in flight"""
+    pending: Deque[Future] = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+
+def metadata_scan_schemas(
+    catalog: Catalog,
+    detectors: List[MetadataDetector],
+    source: CatSource,
+    last_run: Optional[datetime.datetime] = None,
+    include_schema_regex_str: List[str] = None,
+    exclude_schema_regex_str: List[str] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+    workers: int = 2,
+    chunk_size: int = METADATA_CHUNK_SIZE,
+    progress: Optional[ProgressReporter] = None,
+):
+    """Scan column names like metadata_scan with the columns of each schema read by
+    a pool of threads. Every thread reads from the catalog in its own session. The
+    columns are passed to detectors as ColumnInfo and labels are written by this
+    thread in the same order as metadata_scan. So the labels are the same as a
+    serial scan.
+
+    Work in the current session is committed first so that the threads see it. An
+    in-memory SQLite catalog cannot be shared by threads and is read in this thread.
+    """
+    name_cache.bind(detectors_key(detectors))
+    if progress is None:
+        progress = load_reporter()
+    ids = schema_ids(
+        catalog, source, include_schema_regex_str, exclude_schema_regex_str
+    )
+    # Objects of this session must not be used in the threads
+    source_name = source.name
+
+    def read(schema_id: int) -> List[ColumnInfo]:
+        return schema_columns(
+            catalog,
+            source_name,
+            schema_id,
+            last_run,
+            include_table_regex_str,
+            exclude_table_regex_str,
+        )
+
+    def read_in_thread(schema_id: int) -> List[ColumnInfo]:
+        try:
+            return read(schema_id)
+        finally:
+            # Sessions are thread local. Close the session of this thread.
+            catalog.get_scoped_session().remove()
+
+    engine = catalog.engine
+    in_memory = engine.name == "sqlite" and engine.url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+    if in_memory:
+        LOGGER.info("Reading schemata of an in-memory catalog in one thread")
+    else:
+        catalog.get_scoped_session().commit()
+
+    labels = LabelBuffer(catalog)
+    counter = 0
+    set_number = 0
+    chunk: List[Any] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor, progress.start(
+        "schemata", len(ids), "schemata"
     ):
-        counter += 1
-        LOGGER.debug("Scanning column name %s", column.fqdn)
-        for detector in detectors:
-            type = detector.detect(column)
-            if type is not None:
-                set_number += 1
-                catalog.set_column_pii_type(
-                    column=column, pii_type=type, pii_plugin=detector.name
-                )
-                break
+        if in_memory:
+            results: Iterator[List[ColumnInfo]] = map(read, ids)
+        else:
+            results = _map_bounded(executor, read_in_thread, ids, 2 * workers)
+        for columns in results:
+            counter += len(columns)
+            chunk.extend(columns)
+            if len(chunk) >= chunk_size:
+                set_number += _label_columns(labels, detectors, chunk)
+                chunk = []
+            progress.update(1)
+
+        if len(chunk) > 0:
+            set_number += _label_columns(labels, detectors, chunk)
+        labels.flush()
 
     LOGGER.info("Columns Scanned: %d, Columns Labeled: %d", counter, set_number)
+    LOGGER.info("Name Cache: %s", name_cache.stats())
+
+
+def metadata_scan_batches(
+    catalog: Catalog,
+    detectors: List[MetadataDetector],
+    source: CatSource,
+    last_run: Optional[datetime.datetime] = None,
+    include_schema_regex_str: List[str] = None,
+    exclude_schema_regex_str: List[str] = None,
+    include_table_regex_str: List[str] = None,
+    exclude_table_regex_str: List[str] = None,
+    chunk_size: int = METADATA_CHUNK_SIZE,
+    total_columns: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+):
+    """Scan column names like metadata_scan with bounded memory. Columns are read as
+    ColumnInfo in batches of at most chunk_size columns or one table. The labels of
+    a batch are written and committed before the next batch is read. So the session
+    holds no pending changes and no ORM objects are loaded."""
+    name_cache.bind(detectors_key(detectors))
+    if progress is None:
+        progress = load_reporter()
+    session = catalog.get_scoped_session()
+    labels = LabelBuffer(catalog)
+    counter = 0
+    set_number = 0
+    with progress.start("columns", total_columns, "columns"):
+        for batch in column_batches(
+            catalog,
+            source,
+            last_run,
+            include_schema_regex_str,
+            exclude_schema_regex_str,
+            include_table_regex_str,
+            exclude_table_regex_str,
+            batch_size=chunk_size,
+        ):
+            counter += len(batch)
+            set_number += _label_columns(labels, detectors, batch)
+            labels.flush()
+            session.commit()
+            progress.update(len(batch), batch[-1].fqdn[2])
+
+    LOGGER.info("Columns Scanned: %d, Columns Labeled: %d", counter, set_number)
+    LOGGER.info("Name Cache: %s", name_cache.stats())
+
+
+class ValueProfile(NamedTuple):
+    """Character classes and length of a value. Computed once per value to rule out
+    patterns before they are searched."""
+
+    length: int
+    digits: int
+    dashes: int
+    has_at: bool
+    has_dot: bool
+    has_space: bool
+
+
+_delete_digits = str.maketrans("", "", "0123456789")
+
+
+def _profile_value(data: str) -> Optional[ValueProfile]:
+    """Return None if the value is not ASCII. \\d and \\s also match other unicode
+    characters. So the gates do not apply."""
+    if not data.isascii():
+        return None
+    return ValueProfile(
+        length=len(data),
+        digits=len(data) - len(data.translate(_delete_digits)),
+        dashes=data.count("-"),
+        has_at="@" in data,
+        has_dot="." in data,
+        has_space=" " in data,
+    )
+
+
+# Necessary conditions for a CommonRegex pattern to match a value. A pattern is not
+# searched if its gate is False.
+PREFILTER_GATES: Dict[str, Callable[[ValueProfile], bool]] = {
+    "phones": lambda p: p.digits >= 7,
+    "emails": lambda p: p.has_at and p.has_dot,
+    "credit_cards": lambda p: p.digits >= 15,
+    "street_addresses": lambda p: p.digits >= 1 and p.has_space and p.length >= 5,
+    "ssn_number": lambda p: p.digits >= 9 and p.dashes >= 2,
+    "zip_codes": lambda p: p.digits >= 5,
+    "po_boxes": lambda p: p.digits >= 1 and p.has_space and p.length >= 8,
+}
 
 
 @register_detector
@@ -127,64 +503,731 @@ class DatumRegexDetector(DatumDetector):
     """A scanner that uses common regular expressions to find PII"""
 
     name = "DatumRegexDetector"
+    context_free = True
+
+    # CommonRegex patterns in order of priority
+    regex = {
+        "phones": Phone,
+        "emails": Email,
+        "credit_cards": CreditCard,
+        "street_addresses": Address,
+        "ssn_number": SSN,
+        "zip_codes": ZipCode,
+        "po_boxes": PoBox,
+    }
+
+    # Values longer than max_length are not scanned if it is set.
+    max_length: Optional[int] = None
+
+    def __init__(self):
+        self.engine = FusedRegex(
+            [
+                (key, CommonRegex.regex_map[key])  # pylint: disable=no-member
+                for key in self.regex.keys()
+            ]
+        )
+        self._gates = [
+            (rank, "prefilter_{}".format(key), PREFILTER_GATES[key])
+            for rank, key in enumerate(self.regex)
+        ]
+        self._all_ranks = frozenset(range(len(self.regex)))
+        self._counters: Counter = Counter()
+        self._stat_keys = ["{}/{}".format(self.name, key) for key in self.regex]
+
+    def _prefilter(self, data: str) -> FrozenSet[int]:
+        """Return the ranks of the patterns that cannot match the value"""
+        if self.max_length is not None and len(data) > self.max_length:
+            self._counters["prefilter_too_long"] += 1
+            return self._all_ranks
+
+        profile = _profile_value(data)
+        if profile is None:
+            return frozenset()
+
+        skip = []
+        for rank, counter, gate in self._gates:
+            if not gate(profile):
+                skip.append(rank)
+                self._counters[counter] += 1
+        return frozenset(skip)
+
+    def _candidates(
+        self, values: List[Any]
+    ) -> Tuple[List[Any], List[str], List[FrozenSet[int]]]:
+        """Values that are scanned, their text and the ranks to skip"""
+        kept: List[Any] = []
+        texts: List[str] = []
+        skips: List[FrozenSet[int]] = []
+        for datum in values:
+            data = str(datum)
+            skip = self._prefilter(data)
+            if skip == self._all_ranks:
+                self._counters["prefilter_values_skipped"] += 1
+                continue
+            kept.append(datum)
+            texts.append(data)
+            skips.append(skip)
+        self._counters["prefilter_values_scanned"] += len(texts)
+        return kept, texts, skips
+
+    def _probes(self, family: Optional[str]) -> List[int]:
+        """Ranks of the patterns that usually match in the column family"""
+        likely = hit_stats.likely(family, self._stat_keys)
+        return [self._stat_keys.index(key) for key in likely]
 
     def detect(self, column: CatColumn, datum: str) -> Optional[PiiType]:
         """Scan the text and return an array of PiiTypes that are found"""
-        data = str(datum)
-
-        if CommonRegex.phones(data):  # pylint: disable=no-member
-            return Phone()
-        if CommonRegex.emails(data):  # pylint: disable=no-member
-            return Email()
-        if CommonRegex.credit_cards(data):  # pylint: disable=no-member
-            return CreditCard()
-        if CommonRegex.street_addresses(data):  # pylint: disable=no-member
-            return Address()
-        if CommonRegex.ssn_numbers(data):  # pylint: disable=no-member
-            return SSN()
-        if CommonRegex.zip_codes(data):  # pylint: disable=no-member
-            return ZipCode()
-        if CommonRegex.po_boxes(data):  # pylint: disable=no-member
-            return PoBox()
+        _, texts, skips = self._candidates([datum])
+        if len(texts) == 0:
+            return None
+        probes = self._probes(column_family(column))
+        key = self.engine.search(texts[0], skips[0], probes)
+        return self.regex[key]() if key is not None else None
+
+    def detect_batch(
+        self, column: CatColumn, values: List[Any]
+    ) -> Optional[DatumMatch]:
+        kept, texts, skips = self._candidates(values)
+        if len(texts) == 0:
+            return None
+
+        family = column_family(column)
+        probes = self._probes(family)
+        if len(probes) > 0:
+            self._counters["probed_batches"] += 1
+        found = self.engine.find_batch(texts, skips, probes)
+        key = found[1] if found is not None else None
+        for stat_key, name in zip(self._stat_keys, self.regex):
+            hit_stats.record(family, stat_key, name == key)
+        if found is None:
+            return None
+        return DatumMatch(self.regex[found[1]](), kept[found[0]])
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
 
+_POWERS_OF_10 = [10 ** exponent for exponent in range(1, 20)]
+
+# Sum of the Luhn digits of every 2 digit number. The right digit is the one that is
+# not doubled.
+_LUHN_PAIRS = [(pair % 10) + sum(divmod((pair // 10) * 2, 10)) for pair in range(100)]
+
+
+def _to_int(datum: Any) -> Optional[int]:
+    """Return a non-negative integer value or None"""
+    if isinstance(datum, bool):
         return None
+    if isinstance(datum, int):
+        return datum if datum >= 0 else None
+    if isinstance(datum, Decimal):
+        if not datum.is_finite() or datum < 0 or datum != datum.to_integral_value():
+            return None
+        return int(datum)
+    if isinstance(datum, float):
+        if not math.isfinite(datum) or datum < 0 or not datum.is_integer():
+            return None
+        return int(datum)
+    return None
+
+
+def _digit_count(number: int) -> int:
+    return bisect.bisect_right(_POWERS_OF_10, number) + 1
+
+
+def _luhn_valid(number: int) -> bool:
+    total = 0
+    while number > 0:
+        number, pair = divmod(number, 100)
+        total += _LUHN_PAIRS[pair]
+    return total % 10 == 0
+
+
+def _ssn_valid(number: int) -> bool:
+    """Area 100-899 except 666, group 01-99 and serial 0001-9999. Only numbers with 9
+    digits are checked. Leading zeros of an area below 100 are lost in an integer
+    and these numbers cannot be told apart from other integers. So they are not
+    detected."""
+    area, rest = divmod(number, 1000000)
+    group, serial = divmod(rest, 10000)
+    return 100 <= area < 900 and area != 666 and group != 0 and serial != 0
+
+
+# Largest average gap between sorted values of a batch of keys
+SEQUENTIAL_GAP = 10
+
+
+def _is_sequential(numbers: List[int]) -> bool:
+    """Return True if the numbers are close together like the values of an auto
+    increment key"""
+    distinct = set(numbers)
+    if len(distinct) < 2:
+        return False
+    return max(distinct) - min(distinct) <= SEQUENTIAL_GAP * (len(distinct) - 1)
+
+
+def _phone_valid(number: int) -> bool:
+    """A NANP number with an optional country code of 1. The area code and the
+    exchange do not start with 0 or 1."""
+    if 10 ** 10 <= number < 2 * 10 ** 10:
+        number -= 10 ** 10
+    if not 10 ** 9 <= number < 10 ** 10:
+        return False
+    area, rest = divmod(number, 10 ** 7)
+    return area >= 200 and rest >= 2 * 10 ** 6
+
+
+@register_detector
+class DatumNumericDetector(DatumDetector):
+    """Detect SSNs, credit card and phone numbers stored in integer columns.
+
+    Random integers of the right length pass these checks often. So a batch is only
+    labelled if it has ``min_values`` integers, all of them are of the same type and
+    they are not sequential like the values of a key. Most 9 digit integers are
+    valid SSNs. So SSNs are only detected in columns with a name in ``name_hints``.
+    """
+
+    name = "DatumNumericDetector"
+    numeric = True
+
+    min_values = 5
+
+    # Digit counts of every type and its check in order of priority
+    checks: List[Tuple[int, int, Callable[[int], bool], Type[PiiType]]] = [
+        (10, 11, _phone_valid, Phone),
+        (13, 19, _luhn_valid, CreditCard),
+        (9, 9, _ssn_valid, SSN),
+    ]
+
+    # Types that are only detected if the column name matches
+    name_hints: Dict[Type[PiiType], Any] = {
+        SSN: ColumnNameRegexDetector.regex[SSN],
+    }
+
+    def __init__(self):
+        self._counters: Counter = Counter()
+
+    def _hinted(self, column: Any, pii_type: Type[PiiType]) -> bool:
+        hint = self.name_hints.get(pii_type)
+        if hint is None:
+            return True
+        return column is not None and hint.search(column.name) is not None
+
+    def _check(self, number: int) -> Optional[Type[PiiType]]:
+        digits = _digit_count(number)
+        for low, high, check, pii_type in self.checks:
+            if low <= digits <= high and check(number):
+                return pii_type
+        return None
+
+    def detect(self, column: CatColumn, datum: str) -> Optional[PiiType]:
+        number = _to_int(datum)
+        if number is None:
+            return None
+        pii_type = self._check(number)
+        if pii_type is None or not self._hinted(column, pii_type):
+            return None
+        return pii_type()
+
+    def detect_batch(
+        self, column: CatColumn, values: List[Any]
+    ) -> Optional[DatumMatch]:
+        numbers = [
+            (number, datum)
+            for number, datum in zip(map(_to_int, values), values)
+            if number is not None
+        ]
+        self._counters["numeric_values_scanned"] += len(numbers)
+        if len(numbers) < self.min_values:
+            return None
+
+        pii_type = self._check(numbers[0][0])
+        if pii_type is None or not self._hinted(column, pii_type):
+            return None
+        for number, _ in numbers[1:]:
+            if self._check(number) is not pii_type:
+                return None
+        if _is_sequential([number for number, _ in numbers]):
+            self._counters["numeric_sequential_batches"] += 1
+            return None
+        return DatumMatch(pii_type(), numbers[0][1])
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+
+def _detect_cached(
+    detector: DatumDetector, column: CatColumn, values: List[Any]
+) -> Optional[DatumMatch]:
+    """Run detect_batch on values that are not in the detection cache and cache
+    their results. Returns the first value with PII like detect_batch. Values that
+    a GuardedDetector skipped are not cached. SKIPPED is returned if the batch has
+    skipped values and no PII was found."""
+    uncached: List[Tuple[Tuple[str, bytes], Any]] = []
+    cached: Optional[DatumMatch] = None
+    for value in values:
+        key = value_key(detector.name, value)
+        found, pii_type = detection_cache.get(key)
+        if not found:
+            uncached.append((key, value))
+        elif pii_type is not None:
+            # Values after this one do not change the result.
+            cached = DatumMatch(pii_type, value)
+            break
+
+    if len(uncached) == 0:
+        return cached
+
+    match = detector.detect_batch(
+        column=column, values=[value for _, value in uncached]
+    )
+    if match is SKIPPED:
+        # Values that were scanned are not known
+        return cached if cached is not None else SKIPPED
+    if match is None:
+        for key, _ in uncached:
+            detection_cache.put(key, None)
+        return cached
+
+    # Values before the value with PII do not have PII. A GuardedDetector may have
+    # skipped some of them.
+    match_key = value_key(detector.name, match.value)
+    keys = [key for key, _ in uncached]
+    if match_key in keys:
+        if not isinstance(detector, GuardedDetector):
+            for key in keys[: keys.index(match_key)]:
+                detection_cache.put(key, None)
+        detection_cache.put(match_key, match.pii_type)
+    return match
+
+
+def _detect_batch(
+    detectors: Sequence[DatumDetector], column: CatColumn, values: List[Any]
+) -> Tuple[Optional[DatumDetector], Optional[DatumMatch]]:
+    family = column_family(column)
+    numeric = column is not None and _is_numeric_column(column)
+    for detector in detectors:
+        if detector.numeric != numeric:
+            continue
+        if detector.context_free and detection_cache.max_bytes > 0:
+            match = _detect_cached(detector, column, values)
+        else:
+            match = detector.detect_batch(column=column, values=values)
+        if match is SKIPPED:
+            continue
+        hit_stats.record(family, detector.name, match is not None)
+        if match is not None:
+            return detector, match
+
+    return None, None
+
+
+def _label_column(
+    labels: LabelBuffer,
+    column: ColumnInfo,
+    pii_type: PiiType,
+    pii_plugin: str,
+    value: Any,
+    scanned: int,
+):
+    """Buffer the label of a decided column and log one summary record for it.
+    value is the value with PII and scanned is the no. of values of the column
+    that were passed to detectors."""
+    labels.add(column, pii_type, pii_plugin)
+    LOGGER.debug("{} has {}".format(column.fqdn, pii_type))
+
+    scan_logger.info(
+        "deep_scan",
+        extra={
+            "column": column.fqdn,
+            "pii_types": pii_type,
+            "pii_plugin": pii_plugin,
+            "values_scanned": scanned,
+        },
+    )
+    data_logger.info(
+        "deep_scan",
+        extra={"column": column.fqdn, "data": value, "pii_types": pii_type},
+    )
+
+
+def _scan_batch(
+    labels: LabelBuffer,
+    detectors: Sequence[DatumDetector],
+    column: ColumnInfo,
+    values: List[Any],
+    scanned: Counter,
+) -> bool:
+    """scanned counts the values of each column of the table that are scanned"""
+    LOGGER.debug("Scanning %d values of column %s", len(values), column.fqdn)
+    scanned[column.id] += len(values)
+    detector, match = _detect_batch(detectors, column, values)
+    if detector is None or match is None:
+        return False
+
+    _label_column(
+        labels, column, match.pii_type, detector.name, match.value, scanned[column.id]
+    )
+    return True
+
+
+def _scan_batches(
+    labels: LabelBuffer,
+    detectors: Sequence[DatumDetector],
+    batches: Dict[int, Tuple[ColumnInfo, List[Any]]],
+    decided_columns: Set[int],
+    scanned: Counter,
+) -> int:
+    """Scan the remaining batches of a table and return the no. of labelled columns"""
+    labelled = 0
+    for column, values in batches.values():
+        if column.id not in decided_columns and len(values) > 0:
+            if _scan_batch(labels, detectors, column, values, scanned):
+                labelled += 1
+                decided_columns.add(column.id)
+    batches.clear()
+    scanned.clear()
+    return labelled
+
+
+_worker_detectors: List[GuardedDetector] = []
+
+_CACHE_STATS = "Detection Cache"
+
+
+def _log_report(report: List[Dict[str, Any]]):
+    for entry in report:
+        scan_logger.warning("over_budget", extra=entry)
+
+
+def _cache_counters() -> Dict[str, int]:
+    stats = detection_cache.stats()
+    return {key: stats[key] for key in ("hits", "misses", "evictions")}
+
+
+def _is_repeat(seen: Dict[int, Set[Any]], column_id: int, value: Any) -> bool:
+    """Return True if the value was seen before in the column"""
+    values = seen.setdefault(column_id, set())
+    try:
+        if value in values:
+            return True
+        values.add(value)
+    except TypeError:
+        # Values like arrays and json documents are not hashable
+        pass
+    return False
+
+
+def _init_worker(
+    detector_names: List[str],
+    regex_backend: str,
+    cache_bytes: int,
+    hit_counts: Dict[str, Dict[str, List[int]]],
+    untrusted: List[str],
+    call_budget: Optional[float],
+    column_budget: Optional[float],
+):
+    """Load the detector registry once when a worker process starts"""
+    global _worker_detectors
+    set_backend(regex_backend)
+    detection_cache.resize(cache_bytes)
+    hit_stats.clear()
+    hit_stats.merge(hit_counts)
+    registry = detector_registry.get_all()
+    _worker_detectors = [
+        GuardedDetector(
+            IsolatedDetector(name) if name in untrusted else registry[name](),
+            call_budget=call_budget,
+            column_budget=column_budget,
+        )
+        for name in detector_names
+    ]
+
+
+class _TableResult(NamedTuple):
+    # (column id, pii type, detector name, value, values scanned) of labelled columns
+    labels: List[Tuple[int, PiiType, str, Any, int]]
+    # Counters of the detectors and the detection cache
+    stats: Dict[str, Dict[str, int]]
+    hit_counts: Dict[str, Dict[str, List[int]]]
+    # Columns that were skipped by a detector because of its budget
+    report: List[Dict[str, Any]]
+
+
+def _scan_table_in_worker(
+    columns: List[Tuple[ColumnInfo, List[Any]]], batch_size: int
+) -> _TableResult:
+    """Scan the sample of a table in batches of batch_size like data_scan"""
+    before = {d.name: Counter(d.stats()) for d in _worker_detectors}
+    before[_CACHE_STATS] = Counter(_cache_counters())
+    labels = []
+    for column, values in columns:
+        for start in range(0, len(values), batch_size):
+            batch = values[start : start + batch_size]
+            detector, match = _detect_batch(_worker_detectors, column, batch)
+            if detector is not None and match is not None:
+                labels.append(
+                    (
+                        column.id,
+                        match.pii_type,
+                        detector.name,
+                        match.value,
+                        start + len(batch),
+                    )
+                )
+                break
+
+    stats = {
+        d.name: dict(Counter(d.stats()) - before[d.name]) for d in _worker_detectors
+    }
+    stats[_CACHE_STATS] = dict(Counter(_cache_counters()) - before[_CACHE_STATS])
+    report = [entry for d in _worker_detectors for entry in d.take_report()]
+    return _TableResult(labels, stats, hit_stats.take_delta(), report)
+
+
+def _data_scan_workers(
+    labels: LabelBuffer,
+    detectors: List[DatumDetector],
+    generator: Generator[Tuple[CatSchema, CatTable, ColumnInfo, str], None, None],
+    progress: ProgressReporter,
+    decided_columns: Set[int],
+    batch_size: int,
+    workers: int,
+    call_budget: Optional[float],
+    column_budget: Optional[float],
+) -> Tuple[int, int, int]:
+    """Send the sample of every table to a pool of worker processes. Labels are
+    written by this process in the same order as the tables are generated."""
+    registry = detector_registry.get_all()
+    for detector in detectors:
+        if detector.name not in registry or not isinstance(
+            detector, (registry[detector.name], IsolatedDetector)
+        ):
+            raise ValueError(
+                "{} has to be registered to run in workers".format(detector.name)
+            )
+
+    counter = 0
+    set_number = 0
+    repeated = 0
+    stats: Dict[str, Counter] = {d.name: Counter() for d in detectors}
+    stats[_CACHE_STATS] = Counter()
+    pending: Deque[Tuple[Future, Dict[int, ColumnInfo]]] = deque()
+
+    def write_labels(future: Future, columns: Dict[int, ColumnInfo]) -> int:
+        result: _TableResult = future.result()
+        hit_stats.merge(result.hit_counts)
+        for column_id, pii_type, pii_plugin, value, scanned in result.labels:
+            decided_columns.add(column_id)
+            _label_column(
+                labels, columns[column_id], pii_type, pii_plugin, value, scanned
+            )
+        for name, counters in result.stats.items():
+            stats[name].update(counters)
+        _log_report(result.report)
+        return len(result.labels)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            [d.name for d in detectors],
+            get_backend().name,
+            detection_cache.max_bytes,
+            hit_stats.counts,
+            [d.name for d in detectors if isinstance(d, IsolatedDetector)],
+            call_budget,
+            column_budget,
+        ),
+    ) as executor:
+
+        def submit(batches: Dict[int, Tuple[ColumnInfo, List[Any]]]):
+            columns = [
+                (ColumnInfo.from_column(column), values)
+                for column, values in batches.values()
+                if len(values) > 0
+            ]
+            if len(columns) > 0:
+                future = executor.submit(_scan_table_in_worker, columns, batch_size)
+                pending.append(
+                    (future, {column.id: column for column, _ in batches.values()})
+                )
+
+        current_table: Optional[CatTable] = None
+        reported = 0
+        batches: Dict[int, Tuple[ColumnInfo, List[Any]]] = {}
+        seen: Dict[int, Set[Any]] = {}
+        for schema, table, column, val in generator:
+            if table is not current_table:
+                submit(batches)
+                batches = {}
+                seen.clear()
+                if current_table is not None:
+                    progress.update(counter - reported, current_table.name)
+                    reported = counter
+                current_table = table
+                # Keep a bounded no. of tables in flight
+                while len(pending) > 2 * workers:
+                    set_number += write_labels(*pending.popleft())
+
+            counter += 1
+            if val is not None:
+                if _is_repeat(seen, column.id, val):
+                    repeated += 1
+                    continue
+                batches.setdefault(column.id, (column, []))[1].append(val)
+
+        submit(batches)
+        while len(pending) > 0:
+            set_number += write_labels(*pending.popleft())
+        if current_table is not None:
+            progress.update(counter - reported, current_table.name)
+
+    for name, counters in stats.items():
+        if len(counters) > 0:
+            LOGGER.info("%s: %s", name, dict(counters))
+
+    return counter, set_number, repeated
 
 
 def data_scan(
     catalog: Catalog,
     detectors: List[DatumDetector],
-    work_generator: Generator[Tuple[CatSchema, CatTable, CatColumn], None, None],
-    generator: Generator[Tuple[CatSchema, CatTable, CatColumn, str], None, None],
+    generator: Generator[Tuple[CatSchema, CatTable, ColumnInfo, str], None, None],
     sample_size: int = SMALL_TABLE_MAX,
+    decided_columns: Optional[Set[int]] = None,
+    batch_size: int = DATUM_BATCH_SIZE,
+    workers: int = 1,
+    call_budget: Optional[float] = DEFAULT_CALL_BUDGET,
+    column_budget: Optional[float] = DEFAULT_COLUMN_BUDGET,
+    total_columns: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+    labels: Optional[LabelBuffer] = None,
 ):
-    total_columns = _filter_text_columns([c for s, t, c in work_generator])
-    total_work = len(total_columns) * sample_size
+    """Run datum detectors on sampled values and label columns.
+
+    Values of a column are collected in batches of ``batch_size`` and every batch is
+    passed to ``DatumDetector.detect_batch`` of each detector in order. A column is
+    decided as soon as a batch is labelled and the rest of its values are skipped.
+    Pass the same ``decided_columns`` set to ``data_generator`` so that it stops
+    yielding those values and cancels the query of a table once all its columns are
+    decided.
+
+    Text columns are scanned by detectors and numeric columns by detectors that are
+    ``numeric``. Repeats of a value in a column are skipped. Results of detectors that are
+    ``context_free`` are cached in ``piicatcher.cache.detection_cache`` across
+    columns and scans.
+
+    A call to a detector that takes longer than ``call_budget`` seconds is stopped
+    and its values are skipped. A detector skips the rest of a column after it has
+    spent ``column_budget`` seconds on it. Skipped columns are logged to the scan
+    log. None turns off a budget.
+
+    If ``workers`` is more than 1, the sample of every table is scanned in a pool of
+    worker processes with the same batches. The detectors have to be registered.
+
+    ``total_columns`` is the no. of sampled columns and is only used to show
+    progress. It can be computed with ``piicatcher.generators.count_columns`` and
+    ``count_sampled_columns``. Progress is reported once per table by a reporter of
+    ``piicatcher.progress``.
+
+    Labels are written before the scan returns. If ``labels`` is given, they are
+    added to it and the caller writes them.
+    """
+    total_work = total_columns * sample_size if total_columns is not None else None
+    if progress is None:
+        progress = load_reporter()
 
+    if decided_columns is None:
+        decided_columns = set()
+
+    owned = labels is None
+    if labels is None:
+        labels = LabelBuffer(catalog)
+    if workers > 1:
+        with progress.start("datum", total_work, "values"):
+            counter, set_number, repeated = _data_scan_workers(
+                labels=labels,
+                detectors=detectors,
+                generator=generator,
+                progress=progress,
+                decided_columns=decided_columns,
+                batch_size=batch_size,
+                workers=workers,
+                call_budget=call_budget,
+                column_budget=column_budget,
+            )
+        if owned:
+            labels.flush()
+        LOGGER.info(
+            "Columns Scanned: %d, Columns Labeled: %d, Values Repeated: %d",
+            counter,
+            set_number,
+            repeated,
+        )
+        return
+
+    guarded = [
+        GuardedDetector(d, call_budget=call_budget, column_budget=column_budget)
+        for d in detectors
+    ]
     counter = 0
+    skipped = 0
+    repeated = 0
     set_number = 0
 
-    for schema, table, column, val in tqdm(
-        generator, total=total_work, desc="datum", unit="datum"
-    ):
-        counter += 1
-        LOGGER.debug("Scanning column name %s", column.fqdn)
-        if val is not None:
-            for detector in detectors:
-                type = detector.detect(column=column, datum=val)
-                if type is not None:
-                    set_number += 1
-
-                    catalog.set_column_pii_type(
-                        column=column, pii_type=type, pii_plugin=detector.name
-                    )
-                    LOGGER.debug("{} has {}".format(column.fqdn, type))
+    current_table: Optional[CatTable] = None
+    reported = 0
+    batches: Dict[int, Tuple[ColumnInfo, List[Any]]] = {}
+    seen: Dict[int, Set[Any]] = {}
+    scanned: Counter = Counter()
 
-                    scan_logger.info(
-                        "deep_scan", extra={"column": column.fqdn, "pii_types": type}
-                    )
-                    data_logger.info(
-                        "deep_scan",
-                        extra={"column": column.fqdn, "data": val, "pii_types": type},
-                    )
-                    break
-    LOGGER.info("Columns Scanned: %d, Columns Labeled: %d", counter, set_number)
+    with progress.start("datum", total_work, "values"):
+        for schema, table, column, val in generator:
+            if table is not current_table:
+                set_number += _scan_batches(
+                    labels, guarded, batches, decided_columns, scanned
+                )
+                seen.clear()
+                if current_table is not None:
+                    progress.update(counter - reported, current_table.name)
+                    reported = counter
+                current_table = table
+
+            counter += 1
+
+            if column.id in decided_columns:
+                skipped += 1
+                continue
+            if val is not None:
+                if _is_repeat(seen, column.id, val):
+                    repeated += 1
+                    continue
+                values = batches.setdefault(column.id, (column, []))[1]
+                values.append(val)
+                if len(values) >= batch_size:
+                    batches[column.id] = (column, [])
+                    if _scan_batch(labels, guarded, column, values, scanned):
+                        set_number += 1
+                        decided_columns.add(column.id)
+
+        set_number += _scan_batches(labels, guarded, batches, decided_columns, scanned)
+        if current_table is not None:
+            progress.update(counter - reported, current_table.name)
+    if owned:
+        labels.flush()
+    LOGGER.info(
+        "Columns Scanned: %d, Columns Labeled: %d, Values Skipped: %d, "
+        "Values Repeated: %d",
+        counter,
+        set_number,
+        skipped,
+        repeated,
+    )
+    for detector in guarded:
+        stats = detector.stats()
+        if len(stats) > 0:
+            LOGGER.info("%s: %s", detector.name, stats)
+        _log_report(detector.take_report())
+    LOGGER.info("%s: %s", _CACHE_STATS, detection_cache.stats())
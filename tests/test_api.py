@@ -5,7 +5,11 @@ from piicatcher.api import ScanTypeEnum, list_detectors, scan_database
 
 
 def test_detector_list():
-    assert list(list_detectors()) == ["ColumnNameRegexDetector", "DatumRegexDetector"]
+    assert list(list_detectors()) == [
+        "ColumnNameRegexDetector",
+        "DatumRegexDetector",
+        "DatumNumericDetector",
+    ]
 
 
 def test_scan_database_shallow(load_sample_data_and_pull):
@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from piicatcher.automaton import KeywordAutomaton, literal_keywords
+
+
+@pytest.mark.parametrize(
+    "pattern,flags,expected",
+    [
+        ("^.*(email|e-mail|mail).*$", re.IGNORECASE, ["email", "e-mail", "mail"]),
+        ("^.*user(id|name|).*$", re.IGNORECASE, ["userid", "username", "user"]),
+        ("^.*PASS.*$", re.IGNORECASE, ["pass"]),
+        ("^.*(email).*$", 0, None),
+        ("^.*(e.mail).*$", re.IGNORECASE, None),
+        ("^(email).*$", re.IGNORECASE, None),
+        ("^.*().*$", re.IGNORECASE, None),
+    ],
+)
+def test_literal_keywords(pattern, flags, expected):
+    assert literal_keywords(re.compile(pattern, flags)) == expected
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("", None),
+        ("nothing", None),
+        ("he", 2),
+        ("she", 1),
+        ("ushers", 1),
+        ("hers", 2),
+        ("his", 3),
+        ("hi_she", 1),
+    ],
+)
+def test_keyword_automaton(text, expected):
+    automaton = KeywordAutomaton([(2, "he"), (1, "she"), (3, "his"), (2, "hers")])
+    assert automaton.search(text) == expected
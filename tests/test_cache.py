@@ -0,0 +1,44 @@
+from piicatcher import Person
+from piicatcher.cache import DetectionCache, value_key
+
+
+def test_value_key():
+    assert value_key("d", "abc") == value_key("d", "abc")
+    assert value_key("d", "abc") != value_key("e", "abc")
+    assert value_key("d", 1) != value_key("d", "1")
+    assert len(value_key("d", "a" * 10000)[1]) == 16
+
+
+def test_get_put():
+    cache = DetectionCache()
+    assert cache.get(value_key("d", "a")) == (False, None)
+    cache.put(value_key("d", "a"), None)
+    cache.put(value_key("d", "b"), Person())
+    assert cache.get(value_key("d", "a")) == (True, None)
+    assert cache.get(value_key("d", "b")) == (True, Person())
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 2
+
+
+def test_memory_cap():
+    cache = DetectionCache()
+    cache.put(value_key("d", "a"), None)
+    entry_bytes = cache.stats()["bytes"]
+
+    cache = DetectionCache(max_bytes=entry_bytes * 2)
+    cache.put(value_key("d", "a"), None)
+    cache.put(value_key("d", "b"), None)
+    cache.get(value_key("d", "a"))
+    cache.put(value_key("d", "c"), None)
+
+    # b is the least recently used entry
+    assert len(cache) == 2
+    assert cache.get(value_key("d", "b")) == (False, None)
+    assert cache.get(value_key("d", "a")) == (True, None)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= entry_bytes * 2
+
+    cache.resize(0)
+    assert len(cache) == 0
+    assert cache.stats()["bytes"] == 0
@@ -6,9 +6,10 @@ from typer.testing import CliRunner
 
 import piicatcher
 import piicatcher.command_line
-from piicatcher.api import OutputFormat, ScanTypeEnum
+from piicatcher.api import OutputFormat, ProgressEnum, RegexBackendEnum, ScanTypeEnum
 from piicatcher.command_line import app
 from piicatcher.generators import SMALL_TABLE_MAX
+from piicatcher.runner import DEFAULT_CALL_BUDGET, DEFAULT_COLUMN_BUDGET
 
 
 def case_sqlite_cli():
@@ -66,6 +67,15 @@ def test_include_exclude(mocker, temp_sqlite_path, args):
         include_schema_regex=["ischema",],
         include_table_regex=["itable",],
         sample_size=SMALL_TABLE_MAX,
+        regex_backend=RegexBackendEnum.auto,
+        workers=1,
+        detector_timeout=DEFAULT_CALL_BUDGET,
+        column_timeout=DEFAULT_COLUMN_BUDGET,
+        untrusted_detectors=[],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
     )
     piicatcher.command_line.str_output.assert_called_once()
     Catalog.get_source.assert_called_once_with("db_cli")
@@ -114,6 +124,15 @@ def test_multiple_include_exclude(mocker, temp_sqlite_path, args):
         include_schema_regex=["ischema_1", "ischema_2"],
         include_table_regex=["itable_1", "itable_2"],
         sample_size=SMALL_TABLE_MAX,
+        regex_backend=RegexBackendEnum.auto,
+        workers=1,
+        detector_timeout=DEFAULT_CALL_BUDGET,
+        column_timeout=DEFAULT_COLUMN_BUDGET,
+        untrusted_detectors=[],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
     )
     piicatcher.command_line.str_output.assert_called_once()
     Catalog.get_source.assert_called_once_with("db_cli")
@@ -148,6 +167,206 @@ def test_sample_size(mocker, temp_sqlite_path, args):
         include_schema_regex=[],
         include_table_regex=[],
         sample_size=10,
+        regex_backend=RegexBackendEnum.auto,
+        workers=1,
+        detector_timeout=DEFAULT_CALL_BUDGET,
+        column_timeout=DEFAULT_COLUMN_BUDGET,
+        untrusted_detectors=[],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
     )
     piicatcher.command_line.str_output.assert_called_once()
     Catalog.get_source.assert_called_once_with("db_cli")
+
+
+@parametrize_with_cases("args", cases=".")
+def test_regex_backend(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    extended_args = args + [
+        "--regex-backend",
+        "re",
+    ]
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + extended_args)
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    piicatcher.command_line.scan_database.assert_called_once_with(
+        catalog=ANY,
+        source=ANY,
+        scan_type=ScanTypeEnum.metadata,
+        incremental=True,
+        output_format=OutputFormat.tabular,
+        list_all=False,
+        exclude_schema_regex=[],
+        exclude_table_regex=[],
+        include_schema_regex=[],
+        include_table_regex=[],
+        sample_size=SMALL_TABLE_MAX,
+        regex_backend=RegexBackendEnum.re,
+        workers=1,
+        detector_timeout=DEFAULT_CALL_BUDGET,
+        column_timeout=DEFAULT_COLUMN_BUDGET,
+        untrusted_detectors=[],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
+    )
+
+
+@parametrize_with_cases("args", cases=".")
+def test_workers(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    extended_args = args + [
+        "--workers",
+        "4",
+    ]
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + extended_args)
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    piicatcher.command_line.scan_database.assert_called_once_with(
+        catalog=ANY,
+        source=ANY,
+        scan_type=ScanTypeEnum.metadata,
+        incremental=True,
+        output_format=OutputFormat.tabular,
+        list_all=False,
+        exclude_schema_regex=[],
+        exclude_table_regex=[],
+        include_schema_regex=[],
+        include_table_regex=[],
+        sample_size=SMALL_TABLE_MAX,
+        regex_backend=RegexBackendEnum.auto,
+        workers=4,
+        detector_timeout=DEFAULT_CALL_BUDGET,
+        column_timeout=DEFAULT_COLUMN_BUDGET,
+        untrusted_detectors=[],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
+    )
+
+
+@parametrize_with_cases("args", cases=".")
+def test_detector_budgets(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    extended_args = args + [
+        "--detector-timeout",
+        "1.5",
+        "--column-timeout",
+        "0",
+        "--untrusted-detector",
+        "DatumRegexDetector",
+    ]
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + extended_args)
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    piicatcher.command_line.scan_database.assert_called_once_with(
+        catalog=ANY,
+        source=ANY,
+        scan_type=ScanTypeEnum.metadata,
+        incremental=True,
+        output_format=OutputFormat.tabular,
+        list_all=False,
+        exclude_schema_regex=[],
+        exclude_table_regex=[],
+        include_schema_regex=[],
+        include_table_regex=[],
+        sample_size=SMALL_TABLE_MAX,
+        regex_backend=RegexBackendEnum.auto,
+        workers=1,
+        detector_timeout=1.5,
+        column_timeout=0,
+        untrusted_detectors=["DatumRegexDetector"],
+        progress=ProgressEnum.auto,
+        chunked_session=False,
+        crawl_workers=1,
+        catalog_mirror=False,
+    )
+
+
+@parametrize_with_cases("args", cases=".")
+def test_progress(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + args + ["--progress", "json"])
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    kwargs = piicatcher.command_line.scan_database.call_args.kwargs
+    assert kwargs["progress"] == ProgressEnum.json
+
+
+@parametrize_with_cases("args", cases=".")
+def test_chunked_session(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + args + ["--chunked-session"])
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    kwargs = piicatcher.command_line.scan_database.call_args.kwargs
+    assert kwargs["chunked_session"]
+
+
+@parametrize_with_cases("args", cases=".")
+def test_crawl_workers(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + args + ["--crawl-workers", "4"])
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    kwargs = piicatcher.command_line.scan_database.call_args.kwargs
+    assert kwargs["crawl_workers"] == 4
+
+
+@parametrize_with_cases("args", cases=".")
+def test_catalog_mirror(mocker, temp_sqlite_path, args):
+    mocker.patch("piicatcher.command_line.scan_database")
+    mocker.patch.object(Catalog, "get_source")
+    mocker.patch("piicatcher.command_line.str_output")
+
+    catalog_args = ["--catalog-path", temp_sqlite_path]
+    runner = CliRunner()
+    result = runner.invoke(app, catalog_args + args + ["--catalog-mirror"])
+
+    print(result.stdout)
+    assert result.exit_code == 0
+    kwargs = piicatcher.command_line.scan_database.call_args.kwargs
+    assert kwargs["catalog_mirror"]
@@ -0,0 +1,199 @@
+from unittest.mock import patch
+
+import pytest
+from dbcat.catalog.catalog import PGCatalog, SqliteCatalog
+from dbcat.catalog.models import CatColumn, CatSchema, CatTable
+from sqlalchemy import create_engine
+
+import piicatcher.crawler
+from piicatcher.crawler import (
+    SchemaFingerprints,
+    _crawl,
+    _selected,
+    catalog_key,
+    crawl_source,
+    fingerprint_schemata,
+)
+
+
+@pytest.fixture
+def source_engine(load_data):
+    catalog, source_id, name = load_data
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        engine = create_engine(source.conn_string)
+    yield catalog, source_id, engine
+    engine.dispose()
+
+
+def test_selected():
+    assert _selected("public", None, None)
+    assert _selected("public", ["PUB"], None)
+    assert not _selected("public", ["private"], None)
+    assert not _selected("public", None, ["pub"])
+    assert not _selected("public", ["pub"], ["lic"])
+
+
+def test_fingerprint_schemata(source_engine):
+    catalog, source_id, engine = source_engine
+    # SQLite cannot change the type of a column
+    alter_type = {
+        "postgresql": "alter table crawler_test alter column c type varchar(10)",
+        "mysql": "alter table crawler_test modify c varchar(10)",
+    }
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        source_type = source.source_type
+        before = fingerprint_schemata(source)
+        with engine.begin() as conn:
+            conn.execute("create table crawler_test(a text, b text)")
+        try:
+            after = fingerprint_schemata(source)
+            with engine.begin() as conn:
+                conn.execute("alter table crawler_test rename column b to c")
+            renamed = fingerprint_schemata(source)
+            altered = renamed
+            if source_type in alter_type:
+                with engine.begin() as conn:
+                    conn.execute(alter_type[source_type])
+                altered = fingerprint_schemata(source)
+        finally:
+            with engine.begin() as conn:
+                conn.execute("drop table crawler_test")
+
+    assert before is not None and after is not None
+    assert before.keys() == after.keys()
+    changed = [name for name in before if before[name] != after[name]]
+    assert len(changed) == 1
+    assert renamed[changed[0]] != after[changed[0]]
+    if source_type in alter_type:
+        assert altered[changed[0]] != renamed[changed[0]]
+
+
+def test_crawl_source(source_engine):
+    catalog, source_id, engine = source_engine
+    fingerprints = SchemaFingerprints()
+
+    def crawl():
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            with patch.object(
+                piicatcher.crawler,
+                "scan_sources",
+                side_effect=piicatcher.crawler.scan_sources,
+            ) as scan_sources:
+                crawled = crawl_source(catalog, source, fingerprints=fingerprints)
+            fingerprints.update(catalog, source.name, crawled)
+            return crawled, scan_sources.call_count
+
+    crawled, calls = crawl()
+    assert len(crawled) > 0 and calls == 1
+
+    # Nothing changed
+    assert crawl() == ({}, 0)
+
+    with engine.begin() as conn:
+        conn.execute("create table crawler_test(a text, b text)")
+    try:
+        crawled, calls = crawl()
+        assert len(crawled) == 1 and calls == 1
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            table = catalog.get_table(
+                source_name=source.name,
+                schema_name=list(crawled.keys())[0],
+                table_name="crawler_test",
+            )
+            assert table is not None
+    finally:
+        with engine.begin() as conn:
+            conn.execute("drop table crawler_test")
+
+
+def test_crawl_source_without_fingerprints(source_engine):
+    catalog, source_id, engine = source_engine
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        with patch.object(piicatcher.crawler, "scan_sources") as scan_sources:
+            assert crawl_source(catalog, source, fingerprints=None) == {}
+            assert scan_sources.call_count == 1
+
+
+def catalog_columns(catalog, source_id):
+    return sorted(
+        catalog.get_scoped_session()
+        .query(
+            CatSchema.name,
+            CatTable.name,
+            CatColumn.name,
+            CatColumn.data_type,
+            CatColumn.sort_order,
+        )
+        .join(CatTable, CatColumn.table_id == CatTable.id)
+        .join(CatSchema, CatTable.schema_id == CatSchema.id)
+        .filter(CatSchema.source_id == source_id)
+    )
+
+
+def test_crawl_workers(source_engine):
+    catalog, source_id, engine = source_engine
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        scan_sources = piicatcher.crawler.scan_sources
+        scan_sources(catalog, [source.name])
+        crawled = catalog_columns(catalog, source_id)
+
+    with engine.begin() as conn:
+        conn.execute("create table crawler_workers(b text, a text)")
+    try:
+        # Tables crawled by dbcat are found and the new table is added
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            _crawl(catalog, source, workers=2)
+            merged = catalog_columns(catalog, source_id)
+        added = [column for column in merged if column not in crawled]
+        assert [column[1:3] for column in added] == [
+            ("crawler_workers", "a"),
+            ("crawler_workers", "b"),
+        ]
+
+        # The same columns as a crawl by dbcat
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            scan_sources(catalog, [source.name])
+            assert catalog_columns(catalog, source_id) == merged
+            _crawl(catalog, source, include_table_regex=["workers"], workers=2)
+            assert catalog_columns(catalog, source_id) == merged
+    finally:
+        with engine.begin() as conn:
+            conn.execute("drop table crawler_workers")
+
+
+def test_json(tmp_path):
+    catalog = SqliteCatalog(path=str(tmp_path / "catalog.db"))
+    other = SqliteCatalog(path=str(tmp_path / "other.db"))
+    fingerprints = SchemaFingerprints()
+    fingerprints.update(catalog, "src", {"public": "abc"})
+    fingerprints.update(catalog, "src", {"sales": "def"})
+    fingerprints.update(other, "src", {"public": "ghi"})
+
+    loaded = SchemaFingerprints()
+    loaded.from_json(fingerprints.to_json())
+    assert loaded.get(catalog, "src") == {"public": "abc", "sales": "def"}
+    assert loaded.get(other, "src") == {"public": "ghi"}
+    assert loaded.get(catalog, "other") == {}
+
+    # Fingerprints without a catalog
+    (tmp_path / "fingerprints.json").write_text('{"src": {"public": "abc"}}')
+    loaded.load(tmp_path / "fingerprints.json")
+    assert loaded.fingerprints == {}
+
+
+def test_catalog_key():
+    catalog = PGCatalog(
+        user="piiuser", password="secret", host="db", port=5433, database="tokern"
+    )
+    assert catalog_key(catalog) == "postgresql://piiuser:***@db:5433/tokern"
+    assert catalog_key(SqliteCatalog(path="/tmp/catalog.db")) == (
+        "sqlite:////tmp/catalog.db"
+    )
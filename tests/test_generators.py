@@ -2,15 +2,24 @@ from typing import Any, Generator, Tuple
 
 import pytest
 from dbcat.catalog import Catalog, CatColumn, CatSchema, CatSource, CatTable
-from sqlalchemy import create_engine
+from dbcat.generators import CatalogObject, filter_objects, table_generator
+from sqlalchemy import create_engine, event
 
 from piicatcher.dbinfo import get_dbinfo
+from piicatcher.detectors import ColumnInfo
 from piicatcher.generators import (
     _get_query,
     _get_table_count,
+    _is_numeric_column,
+    _is_portable,
     _row_generator,
+    column_batches,
     column_generator,
+    count_columns,
+    count_sampled_columns,
     data_generator,
+    schema_columns,
+    schema_ids,
 )
 
 
@@ -98,6 +107,164 @@ def test_column_generator_exclude_table(load_source):
     assert count == 6
 
 
+def test_column_generator_order(load_source):
+    catalog, source = load_source
+
+    expected = [
+        column.id
+        for schema, table in table_generator(catalog=catalog, source=source)
+        for column in catalog.get_columns_for_table(table=table)
+    ]
+    assert [c.id for _, _, c in column_generator(catalog, source)] == expected
+
+
+def test_column_generator_queries(load_source):
+    catalog, source = load_source
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(catalog.engine, "before_cursor_execute", count)
+    try:
+        columns = list(
+            column_generator(catalog, source, exclude_table_regex_str=["no_pii"])
+        )
+    finally:
+        event.remove(catalog.engine, "before_cursor_execute", count)
+
+    assert len({table for _, table, _ in columns}) > 1
+    # The patterns are evaluated in the query of the columns
+    assert len(statements) == 2
+
+
+@pytest.mark.parametrize(
+    "include, exclude",
+    [
+        (["^full", "PII$"], None),
+        (None, ["^no_", "data"]),
+        (["pii"], ["^partial_pii$"]),
+        # Filtered in Python
+        ([r"\bfull"], None),
+        (None, [r"(?i)^NO_"]),
+        ([r"^\N{LATIN SMALL LETTER F}ull"], None),
+        (None, ["[[:digit:]]"]),
+    ],
+)
+def test_column_generator_table_filters(load_source, include, exclude):
+    catalog, source = load_source
+
+    tables = [
+        table.name
+        for table in filter_objects(
+            include,
+            exclude,
+            [
+                CatalogObject(t.name, t.id)
+                for _, t in table_generator(catalog=catalog, source=source)
+            ],
+        )
+    ]
+    filters = {"include_table_regex_str": include, "exclude_table_regex_str": exclude}
+    columns = list(column_generator(catalog, source, **filters))
+    assert len(tables) > 0
+    assert sorted({t.name for _, t, _ in columns}) == sorted(tables)
+    assert sum(count_columns(catalog, source, **filters).values()) == len(columns)
+
+
+@pytest.mark.parametrize(
+    "pattern, portable",
+    [
+        ("^full", True),
+        ("PII$", True),
+        (r"^no_[a-z]+\.?\d{1,3}$", True),
+        (r"^(partial|full)_pii.*?$", True),
+        ("[^]a-z_-]", True),
+        (r"\bfull", False),
+        ("(?i)^NO_", False),
+        ("a*+", False),
+        ("a{2}+", False),
+        ("a{,2}", False),
+        ("a{1000}", False),
+        (r"\N{LATIN SMALL LETTER F}", False),
+        ("[[:alpha:]]", False),
+        (r"[\d]", False),
+        (r"(a)\1", False),
+        ("a{", False),
+    ],
+)
+def test_is_portable(pattern, portable):
+    assert _is_portable(pattern) == portable
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 1000])
+def test_column_batches(load_source, batch_size):
+    catalog, source = load_source
+
+    batches = list(
+        column_batches(
+            catalog, source, exclude_table_regex_str=["no_pii"], batch_size=batch_size
+        )
+    )
+    expected = column_generator(catalog, source, exclude_table_regex_str=["no_pii"])
+    assert [c.id for batch in batches for c in batch] == [c.id for _, _, c in expected]
+    for batch in batches:
+        # Only a table with more columns than batch_size is a larger batch
+        assert len(batch) <= batch_size or len({c.fqdn[:3] for c in batch}) == 1
+    assert batches[0][0].fqdn == catalog.get_column_by_id(batches[0][0].id).fqdn
+
+
+def test_schema_columns(load_source):
+    catalog, source = load_source
+
+    columns = [
+        column
+        for schema_id in schema_ids(catalog=catalog, source=source)
+        for column in schema_columns(
+            catalog=catalog,
+            source_name=source.name,
+            schema_id=schema_id,
+            exclude_table_regex_str=["full.*"],
+        )
+    ]
+    expected = column_generator(
+        catalog=catalog, source=source, exclude_table_regex_str=["full.*"]
+    )
+    assert [column.id for column in columns] == [c.id for _, _, c in expected]
+    assert columns[0].fqdn == catalog.get_column_by_id(columns[0].id).fqdn
+    assert (
+        schema_ids(catalog=catalog, source=source, exclude_schema_regex_str=[".*"])
+        == []
+    )
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"include_schema_regex_str": ["nomatch"]},
+        {"include_table_regex_str": ["partial.*"]},
+        {"exclude_table_regex_str": ["full.*"]},
+    ],
+)
+def test_count_columns(load_source, filters):
+    catalog, source = load_source
+
+    counts = count_columns(catalog=catalog, source=source, **filters)
+    columns = [
+        c for _, _, c in column_generator(catalog=catalog, source=source, **filters)
+    ]
+    assert sum(counts.values()) == len(columns)
+    for data_type, count in counts.items():
+        assert count == len([c for c in columns if c.data_type == data_type])
+
+
+def test_count_sampled_columns():
+    counts = {"varchar(255)": 3, "text": 1, "int": 2, "date": 4, None: 1}
+    assert count_sampled_columns(counts) == 4
+    assert count_sampled_columns(counts, include_numeric=True) == 6
+
+
 def test_get_table_count(sqlalchemy_engine):
     catalog, source, conn = sqlalchemy_engine
     schemata = catalog.search_schema(source_like=source.name, schema_like="%")
@@ -306,11 +473,14 @@ def test_row_generator(sqlalchemy_engine):
 def test_data_generator(sqlalchemy_engine):
     catalog, source, conn = sqlalchemy_engine
 
-    count = 0
-    for tpl in data_generator(catalog=catalog, source=source):
-        count += 1
+    columns = []
+    for schema, table, column, value in data_generator(catalog=catalog, source=source):
+        columns.append(column)
 
-    assert count == 14
+    assert len(columns) == 14
+    assert all(isinstance(column, ColumnInfo) for column in columns)
+    # Work items are created once per column and not once per value
+    assert len(set(id(column) for column in columns)) == 7
 
 
 def test_data_generator_include_schema(load_source):
@@ -373,3 +543,78 @@ def test_data_generator_include_int_table(load_source):
         count += 1
 
     assert count == 2
+
+
+def test_data_generator_include_numeric(load_source):
+    catalog, source = load_source
+
+    columns = set()
+    for schema, table, column, value in data_generator(
+        catalog=catalog,
+        source=source,
+        include_table_regex_str=["partial_data_type"],
+        include_numeric=True,
+    ):
+        columns.add(column.name)
+
+    assert columns == {"id", "ssn"}
+
+
+@pytest.mark.parametrize(
+    "data_type,expected",
+    [
+        ("integer", True),
+        ("BIGINT", True),
+        ("int8", True),
+        ("INT64", True),
+        ("numeric(19,0)", True),
+        ("NUMBER", True),
+        ("interval", False),
+        ("point", False),
+        ("double precision", False),
+        ("text", False),
+        (None, False),
+    ],
+)
+def test_is_numeric_column(data_type, expected):
+    column = CatColumn(name="a", data_type=data_type, sort_order=0)
+    assert _is_numeric_column(column) == expected
+
+
+def test_data_generator_decided_columns(load_source):
+    catalog, source = load_source
+    schemata = catalog.search_schema(source_like=source.name, schema_like="%")
+    table = catalog.get_table(
+        source_name=source.name, schema_name=schemata[0].name, table_name="partial_pii"
+    )
+    column_a, column_b = catalog.get_columns_for_table(table)
+
+    decided_columns = {column_a.id}
+    count = 0
+    for schema, table, column, val in data_generator(
+        catalog=catalog,
+        source=source,
+        include_table_regex_str=["partial_pii"],
+        decided_columns=decided_columns,
+    ):
+        assert column.id == column_b.id
+        count += 1
+
+    assert count == 2
+
+
+def test_data_generator_cancel_decided_table(load_source):
+    catalog, source = load_source
+
+    decided_columns = set()
+    count = 0
+    for schema, table, column, val in data_generator(
+        catalog=catalog,
+        source=source,
+        include_table_regex_str=["partial_pii"],
+        decided_columns=decided_columns,
+    ):
+        decided_columns.add(column.id)
+        count += 1
+
+    assert count == 2
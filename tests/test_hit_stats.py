@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+from piicatcher.hit_stats import MIN_TRIALS, HitStats, column_family
+
+Column = namedtuple("Column", ["name"])
+
+
+def test_column_family():
+    assert column_family(Column("EMAIL_1")) == "email"
+    assert column_family(Column("contact-email")) == "contact_email"
+    assert column_family(Column("123")) is None
+    assert column_family(None) is None
+
+
+def test_likely():
+    stats = HitStats()
+    for i in range(MIN_TRIALS):
+        stats.record("email", "emails", True)
+        stats.record("email", "phones", i % 5 == 0)
+        stats.record("email", "zip_codes", i % 2 == 0)
+    stats.record("email", "po_boxes", True)
+
+    assert stats.rate("email", "emails") == 1.0
+    assert stats.rate("email", "po_boxes") is None
+    assert stats.rate("phone", "emails") is None
+    assert stats.likely("email", ["phones", "zip_codes", "emails", "po_boxes"]) == [
+        "emails",
+        "zip_codes",
+    ]
+
+
+def test_delta_and_merge():
+    stats = HitStats()
+    stats.record("email", "emails", True)
+    stats.record(None, "emails", True)
+    assert stats.take_delta() == {"email": {"emails": [1, 1]}}
+    assert stats.take_delta() == {}
+
+    stats.merge({"email": {"emails": [2, 0]}, "phone": {"phones": [1, 1]}})
+    assert stats.counts == {
+        "email": {"emails": [3, 1]},
+        "phone": {"phones": [1, 1]},
+    }
+
+
+def test_json():
+    stats = HitStats()
+    stats.record("email", "emails", True)
+
+    loaded = HitStats()
+    loaded.from_json(stats.to_json())
+    assert loaded.counts == {"email": {"emails": [1, 1]}}
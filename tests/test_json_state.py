@@ -0,0 +1,47 @@
+from piicatcher.json_state import JsonState
+
+
+class Names(JsonState):
+    description = "names"
+
+    def __init__(self):
+        self.names = {}
+
+    def clear(self):
+        self.names = {}
+
+    def from_json(self, data):
+        for name, count in data.items():
+            self.names[name] = int(count)
+
+    def to_json(self):
+        return self.names
+
+
+def test_load_save(tmp_path):
+    path = tmp_path / "names.json"
+    state = Names()
+    state.load(path)
+    assert state.names == {}
+
+    state.names = {"email": 1, "phone": 2}
+    state.save(path)
+    assert [p.name for p in tmp_path.iterdir()] == ["names.json"]
+
+    loaded = Names()
+    loaded.names = {"zip": 3}
+    loaded.load(path)
+    assert loaded.names == {"email": 1, "phone": 2}
+
+    path.write_text("not json")
+    loaded.load(path)
+    assert loaded.names == {}
+
+    # State that was added before the error is cleared
+    path.write_text('{"email": 1, "phone": "two"}')
+    loaded.load(path)
+    assert loaded.names == {}
+
+    path.write_text("[1, 2]")
+    loaded.load(path)
+    assert loaded.names == {}
@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock, patch
+
+from piicatcher import Address, Email, Phone
+from piicatcher.detectors import ColumnInfo
+from piicatcher.generators import column_generator
+from piicatcher.label_buffer import LabelBuffer
+
+
+def column_info(column_id: int) -> ColumnInfo:
+    return ColumnInfo(column_id, "c", "text", 0, ("s", "d", "t", "c"))
+
+
+def test_label_buffer_groups():
+    buffer = LabelBuffer(MagicMock())
+    with patch.object(LabelBuffer, "_write", autospec=True) as write:
+        buffer.add(column_info(1), Email(), "first")
+        buffer.add(column_info(2), Phone(), "first")
+        buffer.add(column_info(3), Email(), "first")
+        buffer.add(column_info(4), Email(), "second")
+        # The last label of a column wins
+        buffer.add(column_info(2), Email(), "first")
+        assert len(buffer) == 4
+        assert write.call_count == 0
+
+        assert buffer.flush() == 4
+        assert buffer.flush() == 0
+
+    assert [call.args[1:] for call in write.call_args_list] == [
+        (Email(), "first", [1, 2, 3]),
+        (Email(), "second", [4]),
+    ]
+    assert len(buffer) == 0
+    assert buffer.written == 4
+
+
+def test_label_buffer_flush_size():
+    buffer = LabelBuffer(MagicMock(), flush_size=2)
+    with patch.object(LabelBuffer, "_write", autospec=True) as write:
+        for column_id in range(5):
+            buffer.add(column_info(column_id), Email(), "first")
+        assert [call.args[3] for call in write.call_args_list] == [[0, 1], [2, 3]]
+        buffer.flush()
+    assert len(buffer) == 0
+    assert buffer.written == 5
+
+
+def test_label_buffer_catalog(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        columns = [
+            column for _, _, column in column_generator(catalog=catalog, source=source)
+        ]
+        buffer = LabelBuffer(catalog)
+        for column in columns:
+            buffer.add(column, None, None)
+        buffer.add(columns[0], Email(), "first")
+        buffer.add(columns[1], Address(), "first")
+        buffer.add(columns[2], Email(), "first")
+        buffer.flush()
+
+        # One statement per label and columns in the session are refreshed
+        assert buffer.statements == 3
+        assert [(c.pii_type, c.pii_plugin) for c in columns[:4]] == [
+            (Email(), "first"),
+            (Address(), "first"),
+            (Email(), "first"),
+            (None, None),
+        ]
+        loaded = catalog.get_column_by_id(columns[2].id)
+        assert loaded.pii_type == Email()
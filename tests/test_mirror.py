@@ -0,0 +1,138 @@
+from collections import Counter
+
+import pytest
+
+from piicatcher.api import OutputFormat, ScanTypeEnum, scan_database
+from piicatcher.generators import column_generator, count_columns, data_generator
+from piicatcher.mirror import CatalogMirror
+from piicatcher.output import output_dict, output_tabular
+from piicatcher.scanner import (
+    ColumnNameRegexDetector,
+    DatumRegexDetector,
+    data_scan,
+    metadata_scan,
+)
+
+
+@pytest.fixture
+def load_source(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        yield catalog, source
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [{}, {"include_table_regex_str": ["partial"]}, {"exclude_table_regex_str": [".*"]}],
+)
+def test_mirror_load(load_source, filters):
+    catalog, source = load_source
+    mirror = CatalogMirror.load(catalog=catalog, source=source, **filters)
+
+    expected = [
+        (schema.name, table.name, column.id, column.fqdn)
+        for schema, table, column in column_generator(
+            catalog=catalog, source=source, **filters
+        )
+    ]
+    assert [
+        (schema.name, table.name, column.id, column.fqdn)
+        for schema, table, column in mirror.columns()
+    ] == expected
+    assert mirror.count_columns() == count_columns(
+        catalog=catalog, source=source, **filters
+    )
+
+
+def test_mirror_data_generator(load_source):
+    catalog, source = load_source
+    mirror = CatalogMirror.load(catalog=catalog, source=source)
+
+    def values(generator):
+        return Counter((column.id, value) for _, _, column, value in generator)
+
+    assert values(mirror.data_generator()) == values(
+        data_generator(catalog=catalog, source=source)
+    )
+
+
+def test_mirror_scan(load_source):
+    catalog, source = load_source
+    mirror = CatalogMirror.load(catalog=catalog, source=source)
+    metadata_scan(
+        catalog=catalog,
+        detectors=[ColumnNameRegexDetector()],
+        generator=mirror.columns(),
+        labels=mirror.labels,
+    )
+    data_scan(
+        catalog=catalog,
+        detectors=[DatumRegexDetector()],
+        generator=mirror.data_generator(),
+        labels=mirror.labels,
+    )
+
+    # Labels are written once when the mirror is flushed
+    assert mirror.labels.statements == 0
+    assert mirror.flush() > 0
+    assert 0 < mirror.labels.statements <= 3
+
+    for output in (output_tabular, output_dict):
+        assert output(
+            catalog=catalog,
+            source=source,
+            list_all=True,
+            generator=mirror.output_columns(),
+        ) == output(catalog=catalog, source=source, list_all=True)
+
+
+def test_scan_database_mirror(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        op = scan_database(
+            catalog=catalog,
+            source=source,
+            scan_type=ScanTypeEnum.data,
+            incremental=False,
+            output_format=OutputFormat.json,
+            catalog_mirror=True,
+        )
+        assert op == output_dict(catalog=catalog, source=source)
+        assert len(op["schemata"]) > 0
+
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        with pytest.raises(ValueError):
+            scan_database(
+                catalog=catalog,
+                source=source,
+                chunked_session=True,
+                catalog_mirror=True,
+            )
+
+
+@pytest.mark.parametrize(
+    "filters", [{"exclude_table_regex": ["full"]}, {"include_table_regex": ["partial"]}]
+)
+def test_scan_database_mirror_filters(load_data_and_pull, filters):
+    catalog, source_id = load_data_and_pull
+
+    def scan(catalog_mirror):
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            return scan_database(
+                catalog=catalog,
+                source=source,
+                scan_type=ScanTypeEnum.data,
+                incremental=False,
+                list_all=True,
+                catalog_mirror=catalog_mirror,
+                **filters,
+            )
+
+    op = scan(catalog_mirror=True)
+    assert op == scan(catalog_mirror=False)
+    # The tables that are not scanned are in the output
+    assert any(row[1] == "full_pii" for row in op)
@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from piicatcher import Email, Person
+from piicatcher.name_cache import NameCache, detectors_key
+from piicatcher.scanner import ColumnNameRegexDetector
+
+Column = namedtuple("Column", ["name"])
+
+
+class OtherNames(ColumnNameRegexDetector):
+    regex = {Email: ColumnNameRegexDetector.regex[Email]}
+
+
+def test_detectors_key():
+    detector = ColumnNameRegexDetector()
+    assert detectors_key([detector]) == detectors_key([ColumnNameRegexDetector()])
+    assert detectors_key([detector]) != detectors_key([])
+    # A subclass with other patterns has another version
+    assert OtherNames().version != detector.version
+    assert detectors_key([OtherNames()]) != detectors_key([detector])
+
+
+def test_name_key():
+    detector = ColumnNameRegexDetector()
+    assert detector.name_key(Column("EMAIL")) == "email"
+    assert detector.name_key(Column("Key")) == "Key"
+
+
+def test_get_put_bind():
+    cache = NameCache()
+    cache.bind("a")
+    assert cache.get("d", "email") == (False, None)
+    assert cache.get("d", None) == (False, None)
+
+    cache.put("d", "email", Email())
+    cache.put("d", "id", None)
+    assert cache.get("d", "email") == (True, Email())
+    assert cache.get("d", "id") == (True, None)
+    assert cache.get("e", "email") == (False, None)
+    assert cache.stats() == {"hits": 2, "misses": 3, "entries": 2}
+
+    cache.bind("a")
+    assert len(cache) == 2
+    cache.bind("b")
+    assert len(cache) == 0
+
+
+def test_json():
+    cache = NameCache()
+    cache.bind("a")
+    cache.put("d", "email", Email())
+    cache.put("d", "name", Person())
+    cache.put("d", "id", None)
+
+    loaded = NameCache()
+    loaded.from_json(cache.to_json())
+    assert loaded.key == "a"
+    assert loaded.results == {"d": {"email": Email(), "name": Person(), "id": None}}
+    assert len(loaded) == 3
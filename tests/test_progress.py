@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+
+from piicatcher.progress import (
+    JsonLogProgress,
+    NullProgress,
+    TtyProgress,
+    load_reporter,
+    progress_logger,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = ListHandler()
+    progress_logger.addHandler(handler)
+    yield handler.records
+    progress_logger.removeHandler(handler)
+
+
+def test_load_reporter():
+    assert isinstance(load_reporter("none"), NullProgress)
+    assert isinstance(load_reporter("tty"), TtyProgress)
+    assert isinstance(load_reporter("json"), JsonLogProgress)
+    assert load_reporter("auto").name in ("tty", "json")
+    with pytest.raises(ValueError):
+        load_reporter("bar")
+
+
+def test_json_progress(records):
+    now = [0.0]
+    reporter = JsonLogProgress(interval=10, clock=lambda: now[0])
+
+    with reporter.start("datum", 500, "values"):
+        for table in ["a", "b", "c", "d"]:
+            now[0] += 4
+            reporter.update(100, table)
+
+    # Once after the interval and once when closed
+    assert [(r.done, r.tables, r.table, r.finished) for r in records] == [
+        (300, 3, "c", False),
+        (400, 4, "d", True),
+    ]
+    assert records[0].rate == 25.0
+    assert records[1].total == 500
+    assert records[1].elapsed == 16
+
+
+def test_json_progress_restart(records):
+    reporter = JsonLogProgress(interval=10, clock=lambda: 1.0)
+    reporter.start("columns", None, "columns")
+    reporter.update(5)
+    reporter.start("datum", None, "values")
+    reporter.close()
+    reporter.close()
+
+    assert [(r.desc, r.done, r.rate) for r in records] == [
+        ("columns", 5, None),
+        ("datum", 0, None),
+    ]
+
+
+def test_null_progress(records):
+    with NullProgress().start("datum", 10, "values") as reporter:
+        reporter.update(10, "a")
+    assert records == []
@@ -0,0 +1,123 @@
+import re
+
+import pytest
+
+from piicatcher.regex_engine import (
+    FusedRegex,
+    RegexBackend,
+    UnsupportedPattern,
+    compile_pattern,
+    load_backend,
+)
+
+
+class NoLookaroundBackend(RegexBackend):
+    """Behaves like re2. It does not support lookarounds or report groups."""
+
+    name = "no_lookaround"
+
+    class Pattern:
+        def __init__(self, pattern, flags):
+            self._regex = re.compile(pattern, flags)
+
+        def search(self, text):
+            return True if self._regex.search(text) is not None else None
+
+    def compile(self, pattern, flags=0):
+        if re.search(r"\(\?<?[=!]", pattern) is not None:
+            raise UnsupportedPattern(pattern)
+        return NoLookaroundBackend.Pattern(pattern, flags)
+
+
+patterns = [
+    ("digits", r"(?<!\d)\d{3}(?!\d)"),
+    ("email", r"(?i)[a-z]+@example\.com"),
+    ("word", r"\bfoo\b"),
+]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("nothing here", None),
+        ("123", "digits"),
+        ("1234", None),
+        ("JOHN@EXAMPLE.COM", "email"),
+        ("foo", "word"),
+        # Left-most match is a lower priority pattern
+        ("foo then 123", "digits"),
+        ("foo john@example.com", "email"),
+    ],
+)
+def test_fused_search(text, expected):
+    assert FusedRegex(patterns).search(text) == expected
+
+
+@pytest.mark.parametrize("probes", [[0], [1], [2], [2, 1], [1, 0, 2]])
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("nothing here", None),
+        ("123", "digits"),
+        ("JOHN@EXAMPLE.COM", "email"),
+        ("foo then 123", "digits"),
+        ("foo john@example.com", "email"),
+        ("foo", "word"),
+    ],
+)
+def test_fused_search_probes(text, expected, probes):
+    fused = FusedRegex(patterns)
+    assert fused.search(text, probes=probes) == expected
+    assert fused.search_batch(["abc", text], probes=probes) == expected
+
+
+@pytest.mark.parametrize(
+    "texts,expected",
+    [
+        (["abc", "def"], None),
+        (["12", "3"], None),
+        (["abc", "foo", "123"], "word"),
+        (["foo 123"], "digits"),
+    ],
+)
+def test_fused_search_batch(texts, expected):
+    assert FusedRegex(patterns).search_batch(texts) == expected
+
+
+def test_fused_anchors_in_batch():
+    fused = FusedRegex([("exact", "^abc$")])
+    assert fused.search_batch(["x", "abc", "y"]) == "exact"
+    assert fused.search_batch(["xabc", "abcx"]) is None
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("nothing here", None),
+        ("123", "digits"),
+        ("1234", None),
+        ("foo then 123", "digits"),
+        ("foo john@example.com", "email"),
+        ("foo", "word"),
+    ],
+)
+def test_fused_search_with_backend(text, expected):
+    fused = FusedRegex(patterns, backend=NoLookaroundBackend())
+    assert fused.search(text) == expected
+
+
+def test_compile_pattern_fallback():
+    backend = NoLookaroundBackend()
+    _, used = compile_pattern(r"\d{3}", backend=backend)
+    assert used is backend
+
+    compiled, used = compile_pattern(r"(?<!\d)\d{3}", backend=backend)
+    assert used.name == "re"
+    assert compiled.search("123") is not None
+
+
+def test_load_backend():
+    assert load_backend("re").name == "re"
+    assert load_backend("auto").name in ["re", "re2", "hyperscan"]
+    with pytest.raises(ValueError):
+        load_backend("unknown")
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from piicatcher import Email, Person, Phone
+from piicatcher.cache import detection_cache
+from piicatcher.detectors import ColumnInfo, DatumDetector, DatumMatch
+from piicatcher.runner import (
+    SKIPPED,
+    DetectorTimeout,
+    GuardedDetector,
+    IsolatedDetector,
+    time_limit,
+)
+from piicatcher.scanner import _detect_batch
+
+column = ColumnInfo(1, "a", "text", 0, ("src", "db", "tbl", "a"))
+other = ColumnInfo(2, "b", "text", 1, ("src", "db", "tbl", "b"))
+
+
+class SlowDetector(DatumDetector):
+    """Takes a second on values that start with slow"""
+
+    name = "slow_detector"
+
+    def detect(self, column, datum):
+        if datum.startswith("slow"):
+            time.sleep(1)
+        return Person() if datum == "person" else None
+
+
+def test_time_limit():
+    with pytest.raises(DetectorTimeout):
+        with time_limit(0.05):
+            time.sleep(1)
+
+    with time_limit(None):
+        time.sleep(0.01)
+
+
+def test_guard_call_budget():
+    detector = GuardedDetector(SlowDetector(), call_budget=0.05, column_budget=None)
+    assert detector.detect_batch(column, ["a", "slow", "person"]) == DatumMatch(
+        Person(), "person"
+    )
+    # Values that were skipped are not known to be free of PII
+    assert detector.detect_batch(column, ["b", "slow"]) is SKIPPED
+    assert detector.detect(column, "slow") is SKIPPED
+
+    stats = detector.stats()
+    assert stats["guard_timeouts"] == 5
+    assert stats["guard_values_skipped"] == 3
+    assert detector.take_report() == [
+        {
+            "column": column.fqdn,
+            "detector": "slow_detector",
+            "reason": "call over 0.05s",
+        }
+    ]
+
+
+def test_guard_column_budget():
+    detector = GuardedDetector(SlowDetector(), call_budget=0.05, column_budget=0.08)
+    assert detector.detect_batch(column, ["slow"]) is SKIPPED
+    assert detector.detect_batch(column, ["slow"]) is SKIPPED
+    assert detector.detect_batch(column, ["person"]) is SKIPPED
+    assert detector.detect_batch(other, ["person"]) == DatumMatch(Person(), "person")
+
+    assert detector.stats()["guard_columns_skipped"] == 1
+    assert [entry["reason"] for entry in detector.take_report()] == [
+        "call over 0.05s",
+        "column over 0.08s",
+    ]
+
+
+def test_guard_skipped_values_not_cached():
+    class StallingDetector(DatumDetector):
+        """Stalls on "slow" and on all values until it is released"""
+
+        name = "stalling_detector"
+        context_free = True
+
+        def __init__(self):
+            self.stall = True
+
+        def detect(self, column, datum):
+            if self.stall or datum == "slow":
+                time.sleep(1)
+            return Email() if "@" in datum else None
+
+    detection_cache.clear()
+    stalling = StallingDetector()
+    detector = GuardedDetector(stalling, call_budget=0.05, column_budget=None)
+    assert _detect_batch([detector], column, ["foo@bar.com", "abc"]) == (None, None)
+    assert len(detection_cache) == 0
+
+    # The value is scanned again in another column
+    stalling.stall = False
+    assert _detect_batch([detector], other, ["foo@bar.com"]) == (
+        detector,
+        DatumMatch(Email(), "foo@bar.com"),
+    )
+    assert detection_cache.stats()["hits"] == 0
+    assert len(detection_cache) == 1
+
+    # A skipped value before the value with PII is not cached
+    assert _detect_batch([detector], other, ["slow", "bar@baz.com"]) == (
+        detector,
+        DatumMatch(Email(), "bar@baz.com"),
+    )
+    assert len(detection_cache) == 2
+    detection_cache.clear()
+
+
+def test_isolated_detector():
+    detector = IsolatedDetector("DatumRegexDetector", timeout=60)
+    try:
+        assert detector.detect_batch(column, ["abc", "+1 234 567 8900"]) == DatumMatch(
+            Phone(), "+1 234 567 8900"
+        )
+        assert detector.detect(column, "abc") is None
+        assert detector.stats()["prefilter_values_scanned"] == 1
+    finally:
+        detector.close()
+
+
+def test_isolated_detector_timeout():
+    detector = IsolatedDetector("DatumRegexDetector", timeout=0.000001)
+    try:
+        with pytest.raises(DetectorTimeout):
+            detector.detect(column, "+1 234 567 8900")
+    finally:
+        detector.close()
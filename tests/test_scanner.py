@@ -1,6 +1,12 @@
-from unittest.mock import patch
+import random
+import tracemalloc
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
 
+import dbcat.settings
 import pytest
+from dbcat.api import init_db, open_catalog
+from dbcat.catalog.models import CatColumn, CatSchema, CatSource, CatTable
 
 from piicatcher import (
     SSN,
@@ -17,12 +23,29 @@ from piicatcher import (
     UserName,
     ZipCode,
 )
+from piicatcher.cache import DEFAULT_CACHE_BYTES, detection_cache
+from piicatcher.detectors import DatumDetector, DatumMatch, MetadataDetector
 from piicatcher.generators import column_generator, data_generator
+from piicatcher.hit_stats import MIN_TRIALS, hit_stats
+from piicatcher.label_buffer import LabelBuffer
+from piicatcher.name_cache import name_cache
+from piicatcher.progress import NullProgress
 from piicatcher.scanner import (
+    ColumnInfo,
     ColumnNameRegexDetector,
+    DatumNumericDetector,
     DatumRegexDetector,
+    ValueProfile,
+    _detect_batch,
+    _init_worker,
+    _profile_value,
+    _scan_table_in_worker,
+    data_logger,
     data_scan,
     metadata_scan,
+    metadata_scan_batches,
+    metadata_scan_schemas,
+    scan_logger,
 )
 
 
@@ -117,6 +140,333 @@ def test_datum_regex_pobox(text):
     assert detector.detect(column=None, datum=text) == PoBox()
 
 
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        (["abc", "def"], None),
+        (["abc", "john@example.net"], DatumMatch(Email(), "john@example.net")),
+        (["500 elm street", "234-567-8900"], DatumMatch(Address(), "500 elm street")),
+        (["no pii", 80596], DatumMatch(ZipCode(), 80596)),
+        (["", "a\nb"], None),
+    ],
+)
+def test_datum_regex_batch(values, expected):
+    detector: DatumRegexDetector = DatumRegexDetector()
+    assert detector.detect_batch(column=None, values=values) == expected
+
+
+def test_datum_regex_probes():
+    hit_stats.clear()
+    hit_stats.merge(
+        {
+            "zip": {
+                "DatumRegexDetector/zip_codes": [MIN_TRIALS, MIN_TRIALS],
+                "DatumRegexDetector/emails": [MIN_TRIALS, 0],
+            }
+        }
+    )
+    column = ColumnInfo(1, "zip", "text", 0, ("src", "db", "tbl", "zip"))
+    detector: DatumRegexDetector = DatumRegexDetector()
+    assert detector.detect_batch(column=column, values=["94105"]) == DatumMatch(
+        ZipCode(), "94105"
+    )
+    # Emails have a higher priority than zip codes even if they are less likely.
+    assert detector.detect_batch(
+        column=column, values=["john@example.net 94105"]
+    ) == DatumMatch(Email(), "john@example.net 94105")
+    assert detector.stats()["probed_batches"] == 2
+    assert hit_stats.counts["zip"]["DatumRegexDetector/emails"] == [
+        MIN_TRIALS + 2,
+        1,
+    ]
+    hit_stats.clear()
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        ([2345678900, 12345678900, 4155550123, 6505550000, 2125551234], Phone()),
+        ([4111111111111111] * 5, CreditCard()),
+        ([222065960, 518444378, 653307519, 301010001, 123456789], SSN()),
+        ([Decimal(222065960), 518444378, 653307519, 301010001, 123456789], SSN()),
+        # Not all values are valid
+        ([222065960, 518444378, 653307519, 301010001, 666123456], None),
+        ([222065960, 518444378, 653307519, 301010001, 1010001], None),
+        ([4111111111111111] * 4 + [4111111111111112], None),
+        # Mixed types
+        ([222065960, 518444378, 653307519, 301010001, 2345678900], None),
+        # Too few values
+        ([222065960, 518444378], None),
+        ([1, 2, 3, 4, 5, 6], None),
+        ([222065960.5, -518444378, True, None, "653307519"], None),
+    ],
+)
+def test_datum_numeric_batch(values, expected):
+    column = ColumnInfo(1, "ssn", "bigint", 0, ("src", "db", "tbl", "ssn"))
+    detector = DatumNumericDetector()
+    match = detector.detect_batch(column=column, values=values)
+    if expected is None:
+        assert match is None
+    else:
+        assert match == DatumMatch(expected, values[0])
+
+
+def test_datum_numeric_keys():
+    rnd = random.Random(0)
+    ssn = ColumnInfo(1, "ssn", "bigint", 0, ("src", "db", "tbl", "ssn"))
+    key = ColumnInfo(2, "customer_id", "bigint", 1, ("src", "db", "tbl", "customer_id"))
+    detector = DatumNumericDetector()
+
+    random_keys = [rnd.randrange(100000000, 800000000) for _ in range(20)]
+    assert detector.detect_batch(column=key, values=random_keys) is None
+    assert detector.detect_batch(column=key, values=random_keys[:1]) is None
+    assert detector.detect(column=key, datum=random_keys[0]) is None
+    # Valid SSNs need a hint in the column name
+    ssns = [222065960, 518444378, 653307519, 301010001, 123456789]
+    assert detector.detect_batch(column=key, values=ssns) is None
+    assert detector.detect_batch(column=ssn, values=ssns) == DatumMatch(SSN(), ssns[0])
+
+    # Auto increment keys are not labelled even in a column with a hint
+    for start in (1000000, 123456789, 2345678900, 4111111111111111):
+        sequential = list(range(start, start + 20))
+        assert detector.detect_batch(column=key, values=sequential) is None
+        assert detector.detect_batch(column=ssn, values=sequential) is None
+        with_gaps = sorted(rnd.sample(range(start, start + 100), 20))
+        assert detector.detect_batch(column=ssn, values=with_gaps) is None
+
+    # Random 7 digit keys
+    short_keys = [rnd.randrange(1000000, 9000000) for _ in range(20)]
+    assert detector.detect_batch(column=ssn, values=short_keys) is None
+    assert detector.stats()["numeric_sequential_batches"] > 0
+
+
+def test_datum_numeric_routing():
+    text = ColumnInfo(1, "a", "text", 0, ("src", "db", "tbl", "a"))
+    number = ColumnInfo(2, "ssn", "bigint", 1, ("src", "db", "tbl", "ssn"))
+    detectors = [DatumRegexDetector(), DatumNumericDetector()]
+    ssns = [222065960, 518444378, 653307519, 301010001, 123456789]
+
+    detector, match = _detect_batch(detectors, number, ssns)
+    assert detector is detectors[1]
+    assert match == DatumMatch(SSN(), 222065960)
+    assert _detect_batch(detectors, text, ["222-06-5960"]) == (
+        detectors[0],
+        DatumMatch(SSN(), "222-06-5960"),
+    )
+    assert _detect_batch(detectors[1:], text, ssns) == (None, None)
+
+
+def test_datum_regex_prefilter():
+    detector: DatumRegexDetector = DatumRegexDetector()
+    assert detector.detect_batch(
+        column=None, values=["abc", "a b", "john@example.net"]
+    ) == DatumMatch(Email(), "john@example.net")
+
+    stats = detector.stats()
+    assert stats["prefilter_values_skipped"] == 2
+    assert stats["prefilter_values_scanned"] == 1
+    assert stats["prefilter_phones"] == 3
+    assert stats["prefilter_emails"] == 2
+
+
+def test_datum_regex_prefilter_max_length():
+    detector: DatumRegexDetector = DatumRegexDetector()
+    detector.max_length = 10
+    assert detector.detect(column=None, datum="contact john@example.net") is None
+    assert detector.stats()["prefilter_too_long"] == 1
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        ("", ValueProfile(0, 0, 0, False, False, False)),
+        ("222-06-5960", ValueProfile(11, 9, 2, False, False, False)),
+        ("a@b.com x", ValueProfile(9, 0, 0, True, True, True)),
+        ("\u0663\u0663\u0663", None),
+    ],
+)
+def test_profile_value(data, expected):
+    assert _profile_value(data) == expected
+
+
+def test_datum_default_batch():
+    class LengthDetector(DatumDetector):
+        name = "length_detector"
+
+        def detect(self, column, datum):
+            return Person() if len(datum) > 3 else None
+
+    detector = LengthDetector()
+    assert detector.detect_batch(column=None, values=["ab", "abc"]) is None
+    assert detector.detect_batch(column=None, values=["ab", "abcd"]) == DatumMatch(
+        Person(), "abcd"
+    )
+
+
+def test_detect_batch_cached():
+    class CountingDetector(DatumDetector):
+        name = "counting_detector"
+        context_free = True
+
+        def __init__(self):
+            self.values = []
+
+        def detect(self, column, datum):
+            self.values.append(datum)
+            return Person() if len(datum) > 3 else None
+
+    detection_cache.clear()
+    detector = CountingDetector()
+    assert _detect_batch([detector], None, ["ab", "abc"]) == (None, None)
+    assert _detect_batch([detector], None, ["ab", "abc"]) == (None, None)
+    assert detector.values == ["ab", "abc"]
+
+    assert _detect_batch([detector], None, ["ab", "x", "abcd"]) == (
+        detector,
+        DatumMatch(Person(), "abcd"),
+    )
+    assert _detect_batch([detector], None, ["abcd", "y"]) == (
+        detector,
+        DatumMatch(Person(), "abcd"),
+    )
+    # Values of a batch with PII are not detected again
+    assert detector.values == ["ab", "abc", "x", "abcd"]
+    assert detection_cache.stats()["hits"] == 4
+    assert _detect_batch([detector], None, ["x"]) == (None, None)
+    assert detector.values == ["ab", "abc", "x", "abcd"]
+
+
+def test_metadata_automaton_parity():
+    rnd = random.Random(0)
+    keywords = [
+        "name",
+        "e-mail",
+        "dob",
+        "city",
+        "zip_code",
+        "user",
+        "pass",
+        "ssn",
+        "po_box",
+        "cc_num",
+        "phone",
+        "ma",
+        "il",
+        "na",
+        "me",
+    ]
+    fragments = keywords + ["_", "-", "X", "1", "\u017f", "\u212a", "\u00df", "\n"]
+    names = [
+        "".join(rnd.choice(fragments) for _ in range(rnd.randint(0, 5)))
+        for _ in range(20000)
+    ]
+    names += ["\u017fsn", "\u212aey", "name\n", "x\nname", "ssn\n\n", "Stra\u00dfe"]
+
+    detector = ColumnNameRegexDetector()
+    for name in names:
+        expected = None
+        for pii_type, ex in ColumnNameRegexDetector.regex.items():
+            if ex.search(name) is not None:
+                expected = pii_type()
+                break
+        column = ColumnInfo(1, name, "text", 0, ("src", "db", "tbl", name))
+        assert detector.detect(column) == expected, name
+
+
+class ChunkDetector(MetadataDetector):
+    """Labels columns in names with pii_type and records the chunks it gets"""
+
+    def __init__(self, name, names, pii_type):
+        self.name = name
+        self.names = names
+        self.pii_type = pii_type
+        self.chunks = []
+
+    def detect(self, column):
+        return self.pii_type if column.name in self.names else None
+
+    def detect_many(self, columns):
+        self.chunks.append([column.name for column in columns])
+        return super().detect_many(columns)
+
+
+def written_labels(write):
+    """(column id, pii_type, pii_plugin) of patched LabelBuffer._write calls"""
+    return [
+        (column_id, call.args[1], call.args[2])
+        for call in write.call_args_list
+        for column_id in call.args[3]
+    ]
+
+
+def test_metadata_scan_detect_many():
+    columns = [
+        ColumnInfo(i, name, "text", i, ("src", "db", "tbl", name))
+        for i, name in enumerate(["email", "phone", "id", "city", "email", "id"])
+    ]
+    first = ChunkDetector("first", {"email"}, Email())
+    second = ChunkDetector("second", {"email", "city"}, Address())
+    work = [(None, None, column) for column in columns]
+
+    with patch.object(LabelBuffer, "_write", autospec=True) as write:
+        metadata_scan(
+            catalog=MagicMock(),
+            detectors=[first, second],
+            generator=iter(work),
+            chunk_size=4,
+        )
+
+    assert first.chunks == [["email", "phone", "id", "city"], ["email", "id"]]
+    # The second detector only gets the columns that the first did not label
+    assert second.chunks == [["phone", "id", "city"], ["id"]]
+    labels = written_labels(write)
+    assert sorted(labels, key=lambda label: label[0]) == [
+        (0, Email(), "first"),
+        (3, Address(), "second"),
+        (4, Email(), "first"),
+    ]
+
+
+def test_metadata_scan_name_cache():
+    columns = [
+        ColumnInfo(i, name, "text", i, ("src", "db", "tbl", name))
+        for i, name in enumerate(["Email", "id", "EMAIL", "id"])
+    ]
+    work = [(None, None, column) for column in columns]
+    name_cache.clear()
+
+    with patch.object(
+        ColumnNameRegexDetector,
+        "detect",
+        autospec=True,
+        side_effect=ColumnNameRegexDetector.detect,
+    ) as detect:
+        for _ in range(2):
+            with patch.object(LabelBuffer, "_write", autospec=True) as write:
+                metadata_scan(
+                    catalog=MagicMock(),
+                    detectors=[ColumnNameRegexDetector()],
+                    generator=iter(work),
+                )
+            assert written_labels(write) == [
+                (0, Email(), "ColumnNameRegexDetector"),
+                (2, Email(), "ColumnNameRegexDetector"),
+            ]
+
+    # Each name is matched once in the first scan and not in the second scan
+    assert detect.call_count == 2
+    assert name_cache.stats()["hits"] == 4
+
+
+def test_metadata_detect_many():
+    names = ["fname", "email", "id", "fname", "zip", "ID"]
+    columns = [ColumnInfo(1, name, "text", 0, ("s", "d", "t", name)) for name in names]
+    detector = ColumnNameRegexDetector()
+    assert detector.detect_many(columns) == [
+        detector.detect(column) for column in columns
+    ]
+
+
 @pytest.mark.parametrize(
     "name", ["fname", "full_name", "name", "FNAME", "FULL_NAME", "NAME"]
 )
@@ -253,7 +603,6 @@ def test_shallow_scan(load_data_and_pull):
         metadata_scan(
             catalog=catalog,
             detectors=[ColumnNameRegexDetector()],
-            work_generator=column_generator(catalog=catalog, source=source),
             generator=column_generator(catalog=catalog, source=source),
         )
 
@@ -275,6 +624,124 @@ def test_shallow_scan(load_data_and_pull):
         assert name.pii_type == Person()
 
 
+def test_shallow_scan_workers(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+
+    def scan_labels(scan):
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            for _, _, column in column_generator(catalog=catalog, source=source):
+                catalog.set_column_pii_type(
+                    column=column, pii_type=None, pii_plugin=None
+                )
+            scan(source)
+        with catalog.managed_session:
+            source = catalog.get_source_by_id(source_id)
+            return {
+                column.id: (column.pii_type, column.pii_plugin)
+                for _, _, column in column_generator(catalog=catalog, source=source)
+            }
+
+    serial = scan_labels(
+        lambda source: metadata_scan(
+            catalog=catalog,
+            detectors=[ColumnNameRegexDetector()],
+            generator=column_generator(catalog=catalog, source=source),
+        )
+    )
+    parallel = scan_labels(
+        lambda source: metadata_scan_schemas(
+            catalog=catalog,
+            detectors=[ColumnNameRegexDetector()],
+            source=source,
+            workers=2,
+            chunk_size=2,
+        )
+    )
+
+    batches = scan_labels(
+        lambda source: metadata_scan_batches(
+            catalog=catalog,
+            detectors=[ColumnNameRegexDetector()],
+            source=source,
+            chunk_size=2,
+        )
+    )
+
+    assert parallel == serial
+    assert batches == serial
+    assert (Address(), "ColumnNameRegexDetector") in parallel.values()
+
+
+@pytest.mark.slow
+def test_metadata_scan_batches_memory(tmp_path):
+    """A shallow scan of 1M columns in 10,000 tables stays within a few MB"""
+    catalog = open_catalog(
+        app_dir=tmp_path,
+        secret=dbcat.settings.DEFAULT_CATALOG_SECRET,
+        path=tmp_path / "catalog.db",
+    )
+    init_db(catalog)
+    schemata, tables, columns = 10, 10000, 100
+    with catalog.engine.begin() as conn:
+        conn.execute(
+            CatSource.__table__.insert(),
+            [{"id": 1, "name": "large", "source_type": "sqlite"}],
+        )
+        conn.execute(
+            CatSchema.__table__.insert(),
+            [
+                {"id": s + 1, "name": "s{}".format(s), "source_id": 1}
+                for s in range(schemata)
+            ],
+        )
+        conn.execute(
+            CatTable.__table__.insert(),
+            [
+                {"id": t + 1, "name": "t{}".format(t), "schema_id": t % schemata + 1}
+                for t in range(tables)
+            ],
+        )
+        for start in range(0, tables, 1000):
+            conn.execute(
+                CatColumn.__table__.insert(),
+                [
+                    {
+                        "name": "email" if c == 0 and t % 100 == 0 else "c{}".format(c),
+                        "data_type": "varchar",
+                        "sort_order": c,
+                        "table_id": t + 1,
+                    }
+                    for t in range(start, start + 1000)
+                    for c in range(columns)
+                ],
+            )
+
+    name_cache.clear()
+    with catalog.managed_session:
+        source = catalog.get_source("large")
+        tracemalloc.start()
+        try:
+            metadata_scan_batches(
+                catalog=catalog,
+                detectors=[ColumnNameRegexDetector()],
+                source=source,
+                progress=NullProgress(),
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        labelled = (
+            catalog.get_scoped_session()
+            .query(CatColumn)
+            .filter(CatColumn.pii_plugin == ColumnNameRegexDetector.name)
+        )
+        assert labelled.count() == tables / 100
+    # About 1.2 KB per column of a batch of 5000 and 100 bytes per table
+    assert peak < 20 * 1024 * 1024
+
+
 def test_deep_scan(load_data_and_pull):
     catalog, source_id = load_data_and_pull
     with catalog.managed_session:
@@ -282,7 +749,6 @@ def test_deep_scan(load_data_and_pull):
         data_scan(
             catalog=catalog,
             detectors=[DatumRegexDetector()],
-            work_generator=column_generator(catalog=catalog, source=source),
             generator=data_generator(catalog=catalog, source=source),
         )
 
@@ -294,3 +760,111 @@ def test_deep_scan(load_data_and_pull):
             column_name="a",
         )
         assert state.pii_type == Phone()
+
+
+def test_deep_scan_summary():
+    phone = ColumnInfo(1, "a", "text", 0, ("src", "db", "tbl", "a"))
+    other = ColumnInfo(2, "b", "text", 1, ("src", "db", "tbl", "b"))
+    table = CatTable(name="tbl")
+    values = ["abc", "def", "ghi", "+1 234 567 8900", "+1 234 567 8901", "jkl"]
+    work = []
+    for i, value in enumerate(values):
+        work.append((None, table, phone, value))
+        work.append((None, table, other, str(i)))
+
+    with patch.object(LabelBuffer, "_write", autospec=True) as write, patch.object(
+        scan_logger, "info"
+    ) as info, patch.object(data_logger, "info") as data_info:
+        data_scan(
+            catalog=MagicMock(),
+            detectors=[DatumRegexDetector()],
+            generator=iter(work),
+            batch_size=2,
+            progress=NullProgress(),
+        )
+
+    # One label and one summary record for the column with many matches
+    assert written_labels(write) == [(1, Phone(), "DatumRegexDetector")]
+    assert [call.kwargs["extra"] for call in info.call_args_list] == [
+        {
+            "column": ("src", "db", "tbl", "a"),
+            "pii_types": Phone(),
+            "pii_plugin": "DatumRegexDetector",
+            "values_scanned": 4,
+        }
+    ]
+    # Only the value with PII is logged to the data log
+    assert [call.kwargs["extra"] for call in data_info.call_args_list] == [
+        {
+            "column": ("src", "db", "tbl", "a"),
+            "data": "+1 234 567 8900",
+            "pii_types": Phone(),
+        }
+    ]
+
+
+def test_deep_scan_decided_columns(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        decided_columns = set()
+        data_scan(
+            catalog=catalog,
+            detectors=[DatumRegexDetector()],
+            generator=data_generator(
+                catalog=catalog, source=source, decided_columns=decided_columns
+            ),
+            decided_columns=decided_columns,
+        )
+
+        schemata = catalog.search_schema(source_like=source.name, schema_like="%")
+        column = catalog.get_column(
+            source_name=source.name,
+            schema_name=schemata[0].name,
+            table_name="partial_pii",
+            column_name="a",
+        )
+        assert column.id in decided_columns
+        assert column.pii_type == Phone()
+
+
+def test_deep_scan_workers(load_data_and_pull):
+    catalog, source_id = load_data_and_pull
+    with catalog.managed_session:
+        source = catalog.get_source_by_id(source_id)
+        decided_columns = set()
+        data_scan(
+            catalog=catalog,
+            detectors=[DatumRegexDetector()],
+            generator=data_generator(catalog=catalog, source=source),
+            decided_columns=decided_columns,
+            workers=2,
+        )
+
+        schemata = catalog.search_schema(source_like=source.name, schema_like="%")
+        column = catalog.get_column(
+            source_name=source.name,
+            schema_name=schemata[0].name,
+            table_name="partial_pii",
+            column_name="a",
+        )
+        assert column.id in decided_columns
+        assert column.pii_type == Phone()
+
+
+def test_scan_table_in_worker():
+    _init_worker(["DatumRegexDetector"], "re", DEFAULT_CACHE_BYTES, {}, [], None, None)
+    detection_cache.clear()
+    phone = ColumnInfo(1, "a", "text", 0, ("src", "db", "tbl", "a"))
+    other = ColumnInfo(2, "b", "text", 1, ("src", "db", "tbl", "b"))
+    labels, stats, hit_counts, report = _scan_table_in_worker(
+        [(phone, ["abc", "def", "ghi", "+1 234 567 8900"]), (other, ["abc", "def"])],
+        batch_size=2,
+    )
+
+    assert labels == [(1, Phone(), "DatumRegexDetector", "+1 234 567 8900", 4)]
+    assert stats["Detection Cache"] == {"hits": 2, "misses": 4}
+    assert hit_counts["a"]["DatumRegexDetector"] == [2, 1]
+    assert hit_counts["a"]["DatumRegexDetector/phones"] == [1, 1]
+    assert hit_counts["b"]["DatumRegexDetector"] == [1, 0]
+    assert report == []